@@ -2,10 +2,12 @@ from fastapi import APIRouter
 
 from app.schemas.extras.health import Health
 from core.config import config
+from core.fastapi.middlewares import skip_db_session
 
 health_router = APIRouter()
 
 
 @health_router.get("/")
+@skip_db_session
 async def health() -> Health:
     return Health(version=config.RELEASE_VERSION, status="Healthy")
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from app.schemas.extras.metrics import Metrics
+from core.cache import Cache
+from core.config import config
+from core.database import get_pool_stats
+from core.database.budget import budget_metrics
+from core.database.identity_map import identity_map_stats
+from core.exceptions import NotFoundException
+from core.fastapi.middlewares import skip_db_session
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/")
+@skip_db_session
+async def metrics() -> Metrics:
+    if not config.METRICS_ENABLED:
+        raise NotFoundException()
+    return Metrics(
+        database=get_pool_stats(),
+        budget=budget_metrics.info(),
+        identity_map=identity_map_stats.info(),
+        cache=Cache.backend.stats() if Cache.backend else None,
+    )
@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class PoolMetrics(BaseModel):
+    size: int = Field(..., example=20)
+    checked_out: int = Field(..., example=3)
+    overflow: int = Field(..., example=0)
+    connects: int = Field(..., example=20)
+    checkouts: int = Field(..., example=1500)
+    checkins: int = Field(..., example=1497)
+    invalidations: int = Field(..., example=0)
+    timeouts: int = Field(..., example=0)
+    avg_wait_ms: float = Field(..., example=0.2)
+    max_wait_ms: float = Field(..., example=12.5)
+
+
+class BudgetMetrics(BaseModel):
+    queries_exceeded: int = Field(..., example=0)
+    rows_exceeded: int = Field(..., example=0)
+    statement_timeouts: int = Field(..., example=0)
+    lock_timeouts: int = Field(..., example=0)
+
+
+class IdentityMapMetrics(BaseModel):
+    hits: int = Field(..., example=120)
+    misses: int = Field(..., example=30)
+
+
+class LocalCacheMetrics(BaseModel):
+    hits: int = Field(..., example=900)
+    misses: int = Field(..., example=100)
+    hit_ratio: float = Field(..., example=0.9)
+    size: int = Field(..., example=512)
+    maxsize: int = Field(..., example=1024)
+    bytes: int = Field(..., example=65536)
+    max_bytes: int = Field(..., example=67108864)
+
+
+class RemoteCacheMetrics(BaseModel):
+    hits: int = Field(..., example=80)
+    misses: int = Field(..., example=20)
+    hit_ratio: float = Field(..., example=0.8)
+
+
+class RedisPoolMetrics(BaseModel):
+    max_connections: int = Field(..., example=50)
+    created: int = Field(..., example=4)
+    in_use: int = Field(..., example=1)
+    available: int = Field(..., example=3)
+    utilization: float = Field(..., example=0.02)
+
+
+class CacheMetrics(BaseModel):
+    local: Optional[LocalCacheMetrics] = None
+    redis: Optional[RemoteCacheMetrics] = None
+    pool: Optional[RedisPoolMetrics] = None
+
+
+class Metrics(BaseModel):
+    database: Dict[str, PoolMetrics] = Field(..., example={})
+    budget: BudgetMetrics
+    identity_map: IdentityMapMetrics
+    cache: Optional[CacheMetrics] = None
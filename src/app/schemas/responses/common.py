@@ -23,3 +23,20 @@ class TaskResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class CursorResponse(BaseModel):
+    results: List[dict] = Field(
+        ..., description="Результаты выборки из API", example=[{"id": 1}, {"id": 2}]
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Курсор следующей страницы, если такая существует",
+    )
+    count: Optional[int] = Field(
+        None,
+        description="Количество результатов, если оно было запрошено",
+    )
+
+    class Config:
+        orm_mode = True
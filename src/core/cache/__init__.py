@@ -1,11 +1,22 @@
 from .cache_manager import Cache
 from .cache_tag import CacheTag
-from .custom_key_maker import CustomKeyMaker
+from .custom_key_maker import CustomKeyMaker, skip_cache_key
+from .entry import CacheEntry
+from .lru import LRUCache
+from .memory_backend import InMemoryBackend
 from .redis_backend import RedisBackend
+from .serializers import Serializer
+from .tiered_backend import TieredBackend
 
 __all__ = [
     "Cache",
+    "CacheEntry",
     "RedisBackend",
+    "TieredBackend",
+    "InMemoryBackend",
+    "LRUCache",
+    "Serializer",
     "CustomKeyMaker",
+    "skip_cache_key",
     "CacheTag",
 ]
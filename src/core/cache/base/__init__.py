@@ -1,7 +1,8 @@
 from .backend import BaseBackend
-from .key_maker import BaseKeyMaker
+from .key_maker import BaseKeyMaker, UncacheableArgumentError
 
 __all__ = [
     "BaseKeyMaker",
+    "UncacheableArgumentError",
     "BaseBackend",
 ]
@@ -1,8 +1,22 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Sequence
 
 
 class BaseBackend(ABC):
+    async def connect(self) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+    def stats(self) -> dict:
+        """
+        Metrics of the backend, keyed by ``local``, ``redis`` and ``pool``
+        for the tiers it has.
+        """
+        return {}
+
     @abstractmethod
     async def get(self, key: str) -> Any:
         ...
@@ -14,3 +28,33 @@ class BaseBackend(ABC):
     @abstractmethod
     async def delete_startswith(self, value: str) -> None:
         ...
+
+    async def get_many(self, keys: Sequence[str]) -> List[Any]:
+        """
+        Get the values of several keys, None for the missing ones.
+        """
+        return [await self.get(key=key) for key in keys]
+
+    async def set_many(self, responses: Dict[str, Any], ttl: int = 60) -> None:
+        for key, response in responses.items():
+            await self.set(response=response, key=key, ttl=ttl)
+
+    @abstractmethod
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        ...
+
+    async def delete_tag(self, tag: str) -> None:
+        await self.delete_startswith(value=tag)
+
+    @asynccontextmanager
+    async def lock(
+        self, key: str, timeout: float = 10, blocking: bool = True
+    ) -> AsyncIterator[bool]:
+        """
+        Hold a lock on the key shared by all workers using the backend.
+
+        Backends without shared locks yield True right away.
+
+        :return: Whether the lock was acquired.
+        """
+        yield True
@@ -2,7 +2,20 @@ from abc import ABC, abstractmethod
 from typing import Callable
 
 
+class UncacheableArgumentError(TypeError):
+    """
+    Raised by key makers for arguments that can't be part of a cache key.
+    Calls with such arguments bypass the cache.
+    """
+
+
 class BaseKeyMaker(ABC):
     @abstractmethod
-    async def make(self, function: Callable, prefix: str) -> str:
+    async def make(
+        self,
+        function: Callable,
+        prefix: str,
+        args: tuple = (),
+        kwargs: dict = None,
+    ) -> str:
         ...
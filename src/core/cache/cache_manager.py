@@ -1,47 +1,296 @@
+import asyncio
+import inspect
+import logging
+import math
+import random
+import time
 from functools import wraps
-from typing import Type
+from typing import Any, Awaitable, Callable, Dict, Type
 
-from .base import BaseBackend, BaseKeyMaker
+from .base import BaseBackend, BaseKeyMaker, UncacheableArgumentError
 from .cache_tag import CacheTag
+from .entry import CacheEntry
+
+logger = logging.getLogger(__name__)
 
 
 class CacheManager:
     def __init__(self):
         self.backend = None
         self.key_maker = None
+        self.task_scope = None
+        self._inflight: Dict[str, asyncio.Task] = {}
 
-    def init(self, backend: Type[BaseBackend], key_maker: Type[BaseKeyMaker]) -> None:
+    def init(
+        self,
+        backend: Type[BaseBackend],
+        key_maker: Type[BaseKeyMaker],
+        task_scope: Callable[[Callable], Callable] = None,
+    ) -> None:
+        """
+        :param backend: The cache backend.
+        :param key_maker: Builds the keys of cached calls.
+        :param task_scope: Decorator wrapping loads that run in a task of
+            their own, i.e. background refreshes and single-flight loads
+            shared by concurrent callers, e.g. to give them their own
+            database session.
+        """
         self.backend = backend
         self.key_maker = key_maker
+        self.task_scope = task_scope
+
+    def cached(
+        self,
+        prefix: str = None,
+        tag: CacheTag = None,
+        ttl: int = 60,
+        single_flight: bool = False,
+        stale_ttl: int = 0,
+        lock: bool = False,
+        lock_timeout: int = 10,
+        beta: float = 0,
+    ):
+        """
+        Cache the result of an async function.
+
+        :param prefix: The key prefix.
+        :param tag: The cache tag, used as prefix when no prefix is given.
+        :param ttl: Seconds the value is considered fresh.
+        :param single_flight: Collapse concurrent misses of a key in this
+            process into a single call of the function. The call runs in
+            its own task under ``task_scope``, so cancelling one caller does
+            not fail the others.
+        :param stale_ttl: Seconds a value is still served after it expired
+            while it is refreshed in the background.
+        :param lock: Take a backend lock before computing a missing value,
+            so only one worker computes it.
+        :param lock_timeout: Seconds the lock is held and waited for at most.
+        :param beta: Probabilistic early expiration factor; values refresh
+            in the background before they expire, sooner for slow functions
+            and bigger factors. 0 disables it.
+        """
+        envelope = stale_ttl > 0 or beta > 0
 
-    def cached(self, prefix: str = None, tag: CacheTag = None, ttl: int = 60):
         def _cached(function):
             @wraps(function)
             async def __cached(*args, **kwargs):
                 if not self.backend or not self.key_maker:
                     raise ValueError("Backend or KeyMaker not initialized")
 
-                key = await self.key_maker.make(
-                    function=function,
-                    prefix=prefix if prefix else tag.value,
-                )
+                try:
+                    key = await self.key_maker.make(
+                        function=function,
+                        prefix=prefix if prefix else tag.value,
+                        args=args,
+                        kwargs=kwargs,
+                    )
+                except UncacheableArgumentError as error:
+                    logger.warning("Bypassing the cache: %s", error)
+                    return await function(*args, **kwargs)
+
+                async def compute():
+                    started = time.monotonic()
+                    response = await function(*args, **kwargs)
+                    delta = time.monotonic() - started
+
+                    if envelope:
+                        entry = CacheEntry(response, time.time() + ttl, delta)
+                        await self.backend.set(
+                            response=entry, key=key, ttl=ttl + stale_ttl
+                        )
+                    else:
+                        await self.backend.set(response=response, key=key, ttl=ttl)
+                    return response
+
+                async def load():
+                    if not lock:
+                        return await compute()
+
+                    async with self.backend.lock(key, timeout=lock_timeout) as acquired:
+                        if acquired:
+                            cached_response = await self.backend.get(key=key)
+                            if self._is_fresh(cached_response, envelope):
+                                return (
+                                    cached_response.value
+                                    if envelope
+                                    else cached_response
+                                )
+                        return await compute()
+
+                async def refresh():
+                    if not lock:
+                        return await compute()
+
+                    async with self.backend.lock(
+                        key, timeout=lock_timeout, blocking=False
+                    ) as acquired:
+                        if acquired:
+                            await compute()
+
+                if self.task_scope is not None:
+                    refresh = self.task_scope(refresh)
+                    shared_load = self.task_scope(load)
+                else:
+                    shared_load = load
+
                 cached_response = await self.backend.get(key=key)
-                if cached_response:
-                    return cached_response
+                if not envelope:
+                    if cached_response:
+                        return cached_response
+                elif isinstance(cached_response, CacheEntry):
+                    now = time.time()
+                    if now >= cached_response.expires_at or self._expires_early(
+                        cached_response, now, beta
+                    ):
+                        self._refresh(key, refresh)
+                    return cached_response.value
 
-                response = await function(*args, **kwargs)
-                await self.backend.set(response=response, key=key, ttl=ttl)
-                return response
+                if single_flight:
+                    return await self._single_flight(key, shared_load)
+                return await load()
 
             return __cached
 
         return _cached
 
+    def cached_many(
+        self,
+        prefix: str = None,
+        tag: CacheTag = None,
+        ttl: int = 60,
+        ids_argument: str = "ids",
+        id_attribute: str = "id",
+    ):
+        """
+        Cache the results of an async batch function per id.
+
+        The wrapped function receives a list of ids in ``ids_argument`` and
+        returns either a dict of results by id or a list of objects carrying
+        their id in ``id_attribute``. Cached ids are read with a single
+        ``get_many`` and the function is called only with the missing ones.
+        The decorated function returns a dict of results by id; ids the
+        function did not return are left out and are not cached.
+
+        :param prefix: The key prefix.
+        :param tag: The cache tag, used as prefix when no prefix is given.
+        :param ttl: Seconds the results are cached.
+        :param ids_argument: The name of the argument holding the ids.
+        :param id_attribute: The attribute holding the id of returned objects.
+        """
+
+        def _cached_many(function):
+            signature = inspect.signature(function)
+
+            @wraps(function)
+            async def __cached_many(*args, **kwargs):
+                if not self.backend or not self.key_maker:
+                    raise ValueError("Backend or KeyMaker not initialized")
+
+                bound = signature.bind(*args, **kwargs)
+                ids = list(dict.fromkeys(bound.arguments[ids_argument]))
+                if not ids:
+                    return {}
+
+                bound.arguments[ids_argument] = None
+                try:
+                    base_key = await self.key_maker.make(
+                        function=function,
+                        prefix=prefix if prefix else tag.value,
+                        args=bound.args,
+                        kwargs=bound.kwargs,
+                    )
+                except UncacheableArgumentError as error:
+                    logger.warning("Bypassing the cache: %s", error)
+                    base_key = None
+
+                if base_key is None:
+                    bound.arguments[ids_argument] = ids
+                    response = await function(*bound.args, **bound.kwargs)
+                    return self._by_id(response, id_attribute)
+                keys = [f"{base_key}:{id_}" for id_ in ids]
+
+                results = {}
+                missing = []
+                for id_, cached_response in zip(
+                    ids, await self.backend.get_many(keys=keys)
+                ):
+                    if cached_response is None:
+                        missing.append(id_)
+                    else:
+                        results[id_] = cached_response
+                if not missing:
+                    return results
+
+                bound.arguments[ids_argument] = missing
+                response = self._by_id(
+                    await function(*bound.args, **bound.kwargs), id_attribute
+                )
+
+                await self.backend.set_many(
+                    responses={
+                        f"{base_key}:{id_}": value for id_, value in response.items()
+                    },
+                    ttl=ttl,
+                )
+                results.update(response)
+                return results
+
+            return __cached_many
+
+        return _cached_many
+
+    @staticmethod
+    def _by_id(response: Any, id_attribute: str) -> dict:
+        if isinstance(response, dict):
+            return response
+        return {getattr(item, id_attribute): item for item in response}
+
     async def remove_by_tag(self, tag: CacheTag) -> None:
-        await self.backend.delete_startswith(value=tag.value)
+        await self.backend.delete_tag(tag=tag.value)
 
     async def remove_by_prefix(self, prefix: str) -> None:
         await self.backend.delete_startswith(value=prefix)
 
+    async def _single_flight(
+        self, key: str, load: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._spawn(key, load)
+        return await asyncio.shield(task)
+
+    def _refresh(self, key: str, load: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._inflight:
+            return
+        task = self._spawn(key, load)
+        task.add_done_callback(self._log_refresh_error)
+
+    def _spawn(self, key: str, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(load())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Cache refresh failed", exc_info=task.exception())
+
+    @staticmethod
+    def _expires_early(entry: CacheEntry, now: float, beta: float) -> bool:
+        if beta <= 0:
+            return False
+        early = -entry.delta * beta * math.log(1 - random.random())
+        return now + early >= entry.expires_at
+
+    @staticmethod
+    def _is_fresh(cached_response: Any, envelope: bool) -> bool:
+        if not envelope:
+            return bool(cached_response)
+        return (
+            isinstance(cached_response, CacheEntry)
+            and time.time() < cached_response.expires_at
+        )
+
 
 Cache = CacheManager()
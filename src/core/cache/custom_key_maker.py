@@ -1,18 +1,119 @@
+import datetime
+import enum
+import hashlib
 import inspect
-from typing import Callable
+from decimal import Decimal
+from typing import Any, Callable
+from uuid import UUID
 
-from core.cache.base import BaseKeyMaker
+import ujson
+from fastapi.params import Depends
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTasks
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+from core.cache.base import BaseKeyMaker, UncacheableArgumentError
+
+_SKIPPED_PARAMETERS = {"self", "cls"}
+_SKIPPED_TYPES = (
+    AsyncSession,
+    async_scoped_session,
+    Session,
+    HTTPConnection,
+    Response,
+    BackgroundTasks,
+)
+
+
+def skip_cache_key(cls: type) -> type:
+    """
+    Mark a class whose instances are injected dependencies, such as
+    repositories and services, so `CustomKeyMaker` leaves them out of keys.
+    """
+    cls.__skip_cache_key__ = True
+    return cls
+
+
+def _is_dependency(parameter: inspect.Parameter, value: Any) -> bool:
+    return (
+        parameter.name in _SKIPPED_PARAMETERS
+        or isinstance(parameter.default, Depends)
+        or isinstance(value, _SKIPPED_TYPES)
+        or getattr(type(value), "__skip_cache_key__", False)
+    )
+
+
+def _normalize(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, enum.Enum):
+        return _normalize(value.value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return _normalize(value.dict())
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(item) for item in value), key=repr)
+    raise UncacheableArgumentError(
+        f"{type(value).__name__} can't be part of a cache key"
+    )
 
 
 class CustomKeyMaker(BaseKeyMaker):
-    async def make(self, function: Callable, prefix: str) -> str:
+    """
+    Builds cache keys from the function path and its bound argument values.
+
+    Arguments are bound to the signature with defaults applied, so
+    ``get_all()`` and ``get_all(skip=0)`` share a key. ``self``/``cls``,
+    ``Depends`` parameters, sessions, requests and classes marked with
+    `skip_cache_key` are left out of the key. Any other argument that is not
+    plain data raises `UncacheableArgumentError`, so the call bypasses the
+    cache instead of sharing a key with different arguments.
+    """
+
+    def __init__(self):
+        self._signatures = {}
+
+    async def make(
+        self,
+        function: Callable,
+        prefix: str,
+        args: tuple = (),
+        kwargs: dict = None,
+    ) -> str:
         path = f"{prefix}::{inspect.getmodule(function).__name__}.{function.__name__}"
-        args = ""
 
-        for arg in inspect.signature(function).parameters.values():
-            args += arg.name
+        signature = self._signatures.get(function)
+        if signature is None:
+            signature = self._signatures[function] = inspect.signature(function)
+
+        bound = signature.bind_partial(*args, **(kwargs or {}))
+        bound.apply_defaults()
+
+        arguments = {}
+        for name, value in bound.arguments.items():
+            if _is_dependency(signature.parameters[name], value):
+                continue
+            try:
+                arguments[name] = _normalize(value)
+            except UncacheableArgumentError as error:
+                raise UncacheableArgumentError(
+                    f"Argument '{name}' of {function.__qualname__}: {error}"
+                ) from error
 
-        if args:
-            return f"{path}.{args}"
+        if not arguments:
+            return path
 
-        return path
+        digest = hashlib.blake2b(
+            ujson.dumps(arguments, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        return f"{path}:{digest}"
@@ -0,0 +1,15 @@
+from typing import Any, NamedTuple
+
+
+class CacheEntry(NamedTuple):
+    """
+    Cached value stored together with its freshness metadata.
+
+    :param value: The cached value.
+    :param expires_at: Unix time after which the value is stale.
+    :param delta: Seconds it took to compute the value.
+    """
+
+    value: Any
+    expires_at: float
+    delta: float
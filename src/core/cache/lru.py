@@ -0,0 +1,103 @@
+import bisect
+import time
+from collections import OrderedDict
+from typing import Any, List, NamedTuple
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL.
+
+    The cache is bounded both by the number of entries and by their total
+    size in bytes; the least recently used entries are evicted first.
+    Entries larger than ``max_bytes`` are not stored at all. Keys are kept
+    in a sorted index, so prefix deletion only visits the matching keys.
+    """
+
+    def __init__(self, maxsize: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float, size: int = 0) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        self._entries[key] = _Entry(value, time.monotonic() + ttl, size)
+        bisect.insort(self._keys, key)
+        self.bytes += size
+        while len(self._entries) > self.maxsize or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def delete_startswith(self, value: str) -> int:
+        start = bisect.bisect_left(self._keys, value)
+        end = start
+        while end < len(self._keys) and self._keys[end].startswith(value):
+            end += 1
+
+        keys = self._keys[start:end]
+        del self._keys[start:end]
+        for key in keys:
+            entry = self._entries.pop(key)
+            self.bytes -= entry.size
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+        self.bytes = 0
+
+    def info(self) -> dict:
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+            bytes=self.bytes,
+            max_bytes=self.max_bytes,
+        )
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        del self._keys[bisect.bisect_left(self._keys, key)]
@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Sequence
+
+from core.cache.base import BaseBackend
+from core.cache.lru import LRUCache
+from core.cache.serializers import Serializer
+from core.config import config
+
+
+class InMemoryBackend(BaseBackend):
+    """
+    In-process cache backend for tests and single-node deployments.
+
+    Values are stored encoded by the serializer, like in Redis, so cached
+    objects are not shared between callers and the size bound counts real
+    payload bytes. The cache is not shared between worker processes.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = None,
+        max_bytes: int = None,
+        serializer: Serializer = None,
+    ):
+        self.serializer = serializer or Serializer.from_config()
+        self.cache = LRUCache(
+            maxsize=maxsize or config.CACHE_MEMORY_MAXSIZE,
+            max_bytes=max_bytes or config.CACHE_MEMORY_MAX_BYTES,
+        )
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Any:
+        result = self.cache.get(key)
+        if result is None:
+            return
+        return self.serializer.loads(result)
+
+    async def set(self, response: Any, key: str, ttl: int = 60) -> None:
+        value = self.serializer.dumps(response)
+        self.cache.set(key, value, ttl=ttl, size=len(value))
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self.cache.delete(key)
+
+    async def delete_startswith(self, value: str) -> None:
+        self.cache.delete_startswith(f"{value}::")
+
+    @asynccontextmanager
+    async def lock(
+        self, key: str, timeout: float = 10, blocking: bool = True
+    ) -> AsyncIterator[bool]:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            if not blocking and lock.locked():
+                acquired = False
+            else:
+                try:
+                    await asyncio.wait_for(lock.acquire(), timeout=timeout)
+                    acquired = True
+                except asyncio.TimeoutError:
+                    acquired = False
+
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    lock.release()
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    def stats(self) -> dict:
+        return dict(local=self.cache.info())
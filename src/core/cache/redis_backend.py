@@ -1,34 +1,283 @@
-import pickle
-from typing import Any
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from uuid import uuid4
 
 import redis.asyncio as aioredis
-import ujson
+from redis.asyncio.connection import HiredisParser, PythonParser
+from redis.exceptions import LockError, ResponseError
+from redis.utils import HIREDIS_AVAILABLE
 
 from core.cache.base import BaseBackend
+from core.cache.serializers import Serializer
 from core.config import config
 
-redis = aioredis.from_url(url=config.REDIS_URL)
+# Stores the value and registers its key in the tag set. The tag set lives
+# as long as its longest-lived member, so it does not outlive the keys.
+SET_WITH_TAG = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SADD', KEYS[2], KEYS[1])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+"""
+
+# Removes the given members from the tag set KEYS[1] when their keys have
+# expired. Checking and removing in one script keeps a key that is stored
+# again meanwhile from being dropped from its tag.
+PRUNE_TAG = """
+local removed = 0
+for i = 2, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 0 then
+        removed = removed + redis.call('SREM', KEYS[1], KEYS[i])
+    end
+end
+return removed
+"""
+
+SCAN_COUNT = 1000
+UNLINK_CHUNK_SIZE = 100
+
+_PARSERS = {"hiredis": HiredisParser, "python": PythonParser}
+
+logger = logging.getLogger(__name__)
 
 
 class RedisBackend(BaseBackend):
+    def __init__(self, serializer: Serializer = None, url: str = None):
+        self.serializer = serializer or Serializer.from_config()
+        self.url = url or config.REDIS_URL
+        self.pool: Optional[aioredis.ConnectionPool] = None
+        self._redis: Optional[aioredis.Redis] = None
+        self._set_with_tag = None
+        self._prune_tag = None
+        self._tag_writes: Dict[str, int] = {}
+        self._pruning: Dict[str, asyncio.Task] = {}
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """
+        The client of the backend's connection pool.
+
+        The pool is created on first use when the backend is used before
+        `connect`, e.g. outside the application.
+        """
+        if self._redis is None:
+            self.pool = self._create_pool()
+            self._redis = aioredis.Redis(connection_pool=self.pool)
+            self._set_with_tag = self._redis.register_script(SET_WITH_TAG)
+            self._prune_tag = self._redis.register_script(PRUNE_TAG)
+        return self._redis
+
+    async def connect(self) -> None:
+        await self.redis.ping()
+
+    async def close(self) -> None:
+        for task in list(self._pruning.values()):
+            task.cancel()
+        if self._redis is None:
+            return
+        await self._redis.close()
+        await self.pool.disconnect()
+        self._redis = self.pool = self._set_with_tag = self._prune_tag = None
+
+    def stats(self) -> dict:
+        return dict(pool=self.pool_stats())
+
+    def pool_stats(self) -> dict:
+        if self.pool is None:
+            return dict(
+                max_connections=config.REDIS_MAX_CONNECTIONS,
+                created=0,
+                in_use=0,
+                available=0,
+                utilization=0.0,
+            )
+
+        in_use = len(self.pool._in_use_connections)
+        return dict(
+            max_connections=self.pool.max_connections,
+            created=self.pool._created_connections,
+            in_use=in_use,
+            available=len(self.pool._available_connections),
+            utilization=in_use / self.pool.max_connections,
+        )
+
     async def get(self, key: str) -> Any:
-        result = await redis.get(key)
+        result = await self.redis.get(key)
         if not result:
             return
 
-        try:
-            return ujson.loads(result.decode("utf8"))
-        except UnicodeDecodeError:
-            return pickle.loads(result)
+        return self.loads(result)
 
     async def set(self, response: Any, key: str, ttl: int = 60) -> None:
-        if isinstance(response, dict):
-            response = ujson.dumps(response)
-        elif isinstance(response, object):
-            response = pickle.dumps(response)
+        await self._store(key=key, value=self.dumps(response), ttl=ttl)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Any]:
+        if not keys:
+            return []
+        return [
+            self.loads(result) if result else None
+            for result in await self.redis.mget(keys)
+        ]
+
+    async def set_many(self, responses: Dict[str, Any], ttl: int = 60) -> None:
+        await self._store_many(
+            {key: self.dumps(response) for key, response in responses.items()},
+            ttl=ttl,
+        )
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        if keys:
+            await self.redis.unlink(*keys)
+
+    async def delete_tag(self, tag: str) -> None:
+        """
+        Delete every key registered under the tag.
+
+        The tag set is renamed first, so keys written during the deletion
+        are registered in a new set and survive it.
+        """
+        snapshot = f"{self.tag_key(tag)}:deleting:{uuid4().hex}"
+        try:
+            await self.redis.rename(self.tag_key(tag), snapshot)
+        except ResponseError:
+            return
+
+        await self._unlink(self.redis.sscan_iter(snapshot, count=SCAN_COUNT))
+        await self.redis.unlink(snapshot)
+
+    async def prune_tag(self, tag: str) -> int:
+        """
+        Remove keys that have expired from the tag set.
 
-        await redis.set(name=key, value=response, ex=ttl)
+        Tag sets only shrink when the tag is deleted, so this runs in the
+        background after every ``CACHE_TAG_PRUNE_INTERVAL`` writes to a tag
+        in this process.
+
+        :return: The number of removed keys.
+        """
+        tag_key = self.tag_key(tag)
+        redis = self.redis
+        removed = 0
+        batch = []
+        async for member in redis.sscan_iter(tag_key, count=SCAN_COUNT):
+            batch.append(member)
+            if len(batch) >= SCAN_COUNT:
+                removed += await self._prune_tag(keys=[tag_key, *batch], client=redis)
+                batch = []
+        if batch:
+            removed += await self._prune_tag(keys=[tag_key, *batch], client=redis)
+        return removed
 
     async def delete_startswith(self, value: str) -> None:
-        async for key in redis.scan_iter(f"{value}::*"):
-            await redis.delete(key)
+        await self._unlink(self.redis.scan_iter(f"{value}::*", count=SCAN_COUNT))
+
+    @asynccontextmanager
+    async def lock(
+        self, key: str, timeout: float = 10, blocking: bool = True
+    ) -> AsyncIterator[bool]:
+        lock = self.redis.lock(
+            f"lock:{key}", timeout=timeout, blocking_timeout=timeout
+        )
+        acquired = await lock.acquire(blocking=blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    pass
+
+    def _create_pool(self) -> aioredis.ConnectionPool:
+        options = dict(
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=config.REDIS_SOCKET_KEEPALIVE,
+            health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+            retry_on_timeout=True,
+        )
+        if config.REDIS_PARSER == "hiredis" and not HIREDIS_AVAILABLE:
+            raise ImportError(
+                "hiredis is required for REDIS_PARSER=hiredis, install the "
+                "cache extra"
+            )
+        if config.REDIS_PARSER != "auto":
+            options["parser_class"] = _PARSERS[config.REDIS_PARSER]
+        return aioredis.ConnectionPool.from_url(self.url, **options)
+
+    @staticmethod
+    def tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+
+    async def _store(self, key: str, value: bytes, ttl: int) -> None:
+        tag = key.split("::", 1)[0]
+        redis = self.redis
+        await self._set_with_tag(
+            keys=[key, self.tag_key(tag)], args=[value, ttl], client=redis
+        )
+        self._count_tag_writes(tag)
+
+    async def _store_many(self, values: Dict[str, bytes], ttl: int) -> None:
+        if not values:
+            return
+        async with self.redis.pipeline(transaction=False) as pipeline:
+            for key, value in values.items():
+                tag = key.split("::", 1)[0]
+                await self._set_with_tag(
+                    keys=[key, self.tag_key(tag)], args=[value, ttl], client=pipeline
+                )
+            await pipeline.execute()
+        for key in values:
+            self._count_tag_writes(key.split("::", 1)[0])
+
+    def _count_tag_writes(self, tag: str) -> None:
+        interval = config.CACHE_TAG_PRUNE_INTERVAL
+        if not interval:
+            return
+
+        writes = self._tag_writes.get(tag, 0) + 1
+        if writes < interval:
+            self._tag_writes[tag] = writes
+            return
+
+        self._tag_writes[tag] = 0
+        if tag not in self._pruning:
+            task = asyncio.get_running_loop().create_task(self.prune_tag(tag))
+            self._pruning[tag] = task
+            task.add_done_callback(partial(self._pruned, tag))
+
+    def _pruned(self, tag: str, task: asyncio.Task) -> None:
+        del self._pruning[tag]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                "Pruning cache tag %s failed", tag, exc_info=task.exception()
+            )
+
+    async def _unlink(self, keys: AsyncIterator[bytes]) -> None:
+        """
+        Unlink the keys in pipelined batches of ``UNLINK`` commands.
+        """
+        batch = []
+        async with self.redis.pipeline(transaction=False) as pipeline:
+            async for key in keys:
+                batch.append(key)
+                if len(batch) >= UNLINK_CHUNK_SIZE:
+                    pipeline.unlink(*batch)
+                    batch = []
+                if len(pipeline) >= SCAN_COUNT // UNLINK_CHUNK_SIZE:
+                    await pipeline.execute()
+            if batch:
+                pipeline.unlink(*batch)
+            if len(pipeline):
+                await pipeline.execute()
+
+    def dumps(self, response: Any) -> bytes:
+        return self.serializer.dumps(response)
+
+    def loads(self, result: bytes) -> Any:
+        return self.serializer.loads(result)
@@ -0,0 +1,223 @@
+import datetime
+import enum
+import pickle
+import zlib
+from decimal import Decimal
+from typing import Any, Callable, Dict, Tuple
+from uuid import UUID
+
+import ujson
+from pydantic import BaseModel
+from sqlalchemy import inspect as sqla_inspect
+from sqlalchemy.engine import Row
+
+from core.config import config
+
+from .entry import CacheEntry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+# The first byte of a payload: codec in the low three bits, the ENTRY flag
+# for a `CacheEntry` envelope, and compression in the high nibble. Payloads
+# written before the header existed start with 0x80 (pickle) or "{" (ujson
+# dict), which no header value collides with.
+PICKLE, JSON, MSGPACK = 0x01, 0x02, 0x03
+ENTRY = 0x08
+NONE, ZLIB, ZSTD, LZ4 = 0x00, 0x10, 0x20, 0x30
+
+_LEGACY_PICKLE = 0x80
+_LEGACY_JSON = ord("{")
+
+
+def _encode_default(value: Any) -> Any:
+    """
+    Convert values the fast codecs do not support into plain data.
+    """
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, Row):
+        return value._asdict()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+
+    state = sqla_inspect(value, raiseerr=False)
+    if state is not None and hasattr(state, "mapper"):
+        loaded = state.dict
+        return {
+            attribute.key: loaded[attribute.key]
+            for attribute in state.mapper.column_attrs
+            if attribute.key in loaded
+        }
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def _json_dumps(value: Any, plain: bool) -> bytes:
+    if orjson is not None:
+        if plain:
+            # Datetimes and dataclasses are left to pickle, so they come
+            # back from the cache with their type.
+            return orjson.dumps(
+                value,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        return orjson.dumps(value, default=_encode_default)
+    if plain:
+        return ujson.dumps(value).encode("utf8")
+    return ujson.dumps(value, default=_encode_default).encode("utf8")
+
+
+def _json_loads(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return ujson.loads(payload)
+
+
+def _msgpack_dumps(value: Any, plain: bool) -> bytes:
+    return msgpack.packb(value, default=None if plain else _encode_default)
+
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload)
+
+
+def _pickle_dumps(value: Any, plain: bool) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+_CODECS: Dict[int, Tuple[Callable[[Any, bool], bytes], Callable[[bytes], Any]]] = {
+    PICKLE: (_pickle_dumps, pickle.loads),
+    JSON: (_json_dumps, _json_loads),
+    MSGPACK: (_msgpack_dumps, _msgpack_loads),
+}
+
+_COMPRESSORS: Dict[int, Tuple[Callable, Callable]] = {
+    ZLIB: (zlib.compress, zlib.decompress),
+}
+if zstandard is not None:
+    _COMPRESSORS[ZSTD] = (
+        zstandard.ZstdCompressor().compress,
+        zstandard.ZstdDecompressor().decompress,
+    )
+if lz4 is not None:
+    _COMPRESSORS[LZ4] = (lz4.compress, lz4.decompress)
+
+_CODEC_NAMES = {"auto": None, "pickle": PICKLE, "json": JSON, "msgpack": MSGPACK}
+_COMPRESSION_NAMES = {"none": NONE, "zlib": ZLIB, "zstd": ZSTD, "lz4": LZ4}
+
+
+class Serializer:
+    """
+    Encodes cache values into payloads with a one-byte format header.
+
+    With the ``auto`` codec, JSON-compatible data (dicts, lists, strings,
+    numbers) is stored as JSON and everything else is pickled. When orjson
+    is installed, UUIDs, enums and tuples nested in such data are encoded
+    natively and come back as strings and lists. The ``json`` and
+    ``msgpack`` codecs store everything as plain data: Pydantic models,
+    SQLAlchemy rows and ORM instances come back from the cache as dicts.
+    A `CacheEntry` keeps its type with every codec. Payloads of at least
+    ``compress_min_size`` bytes are compressed.
+
+    Payloads are decoded by their header, so changing the configuration
+    does not invalidate values that are already cached.
+    """
+
+    def __init__(
+        self,
+        codec: str = "auto",
+        compression: str = "none",
+        compress_min_size: int = 1024,
+    ):
+        if codec not in _CODEC_NAMES:
+            raise ValueError(f"Unknown cache serializer: {codec}")
+        if compression not in _COMPRESSION_NAMES:
+            raise ValueError(f"Unknown cache compression: {compression}")
+
+        self.codec = _CODEC_NAMES[codec]
+        self.compression = _COMPRESSION_NAMES[compression]
+        self.compress_min_size = compress_min_size
+
+        if self.codec == MSGPACK and msgpack is None:
+            raise ImportError(
+                "msgpack is required for the msgpack cache serializer, install "
+                "the cache extra"
+            )
+        if self.compression != NONE and self.compression not in _COMPRESSORS:
+            raise ImportError(
+                f"{compression} is required for cache compression, install the "
+                f"cache extra"
+            )
+
+    @classmethod
+    def from_config(cls) -> "Serializer":
+        return cls(
+            codec=config.CACHE_SERIALIZER,
+            compression=config.CACHE_COMPRESSION,
+            compress_min_size=config.CACHE_COMPRESS_MIN_SIZE,
+        )
+
+    def dumps(self, value: Any) -> bytes:
+        envelope = NONE
+        if isinstance(value, CacheEntry):
+            envelope = ENTRY
+            value = list(value)
+        codec, payload = self._encode(value)
+
+        compression = NONE
+        if self.compression != NONE and len(payload) >= self.compress_min_size:
+            compression = self.compression
+            payload = _COMPRESSORS[compression][0](payload)
+
+        return bytes((codec | envelope | compression,)) + payload
+
+    def loads(self, payload: bytes) -> Any:
+        header = payload[0]
+        if header == _LEGACY_PICKLE:
+            return pickle.loads(payload)
+        if header == _LEGACY_JSON:
+            return ujson.loads(payload)
+
+        body = payload[1:]
+        compression = header & 0xF0
+        if compression != NONE:
+            body = _COMPRESSORS[compression][1](body)
+        value = _CODECS[header & 0x07][1](body)
+        if header & ENTRY:
+            return CacheEntry(*value)
+        return value
+
+    def _encode(self, value: Any) -> Tuple[int, bytes]:
+        if self.codec is not None:
+            return self.codec, _CODECS[self.codec][0](value, False)
+
+        if isinstance(value, (dict, list, str, int, float)):
+            try:
+                return JSON, _json_dumps(value, True)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        return PICKLE, _pickle_dumps(value, True)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import uuid4
+
+import ujson
+from redis.exceptions import RedisError
+
+from core.cache.lru import LRUCache
+from core.cache.redis_backend import RedisBackend
+from core.cache.serializers import Serializer
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class TieredBackend(RedisBackend):
+    """
+    Redis backend with a bounded in-process LRU in front of it.
+
+    Hits in the local tier skip both the Redis round trip and the decoding
+    of the payload. Local entries live at most ``local_ttl`` seconds, which
+    bounds how stale a worker can be. Prefix invalidations are applied
+    locally right away and broadcast to the other workers over Redis
+    pub/sub; a worker that loses the subscription drops its local tier.
+
+    Values returned from the local tier are shared between callers and
+    must not be mutated.
+    """
+
+    def __init__(
+        self,
+        local_ttl: float = None,
+        maxsize: int = None,
+        max_bytes: int = None,
+        channel: str = None,
+        serializer: Serializer = None,
+    ):
+        super().__init__(serializer=serializer)
+        self.local_ttl = local_ttl if local_ttl is not None else config.CACHE_LOCAL_TTL
+        self.local = LRUCache(
+            maxsize=maxsize or config.CACHE_LOCAL_MAXSIZE,
+            max_bytes=max_bytes or config.CACHE_LOCAL_MAX_BYTES,
+        )
+        self.channel = channel or config.CACHE_INVALIDATION_CHANNEL
+        self.origin = uuid4().hex
+        self.remote_hits = 0
+        self.remote_misses = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(self, key: str) -> Any:
+        self._ensure_listener()
+
+        response = self.local.get(key)
+        if response is not None:
+            return response
+
+        result = await self.redis.get(key)
+        if not result:
+            self.remote_misses += 1
+            return
+
+        self.remote_hits += 1
+        response = self.loads(result)
+        self.local.set(key, response, ttl=self.local_ttl, size=len(result))
+        return response
+
+    async def set(self, response: Any, key: str, ttl: int = 60) -> None:
+        self._ensure_listener()
+
+        value = self.dumps(response)
+        await self._store(key=key, value=value, ttl=ttl)
+        self.local.set(key, response, ttl=min(self.local_ttl, ttl), size=len(value))
+
+    async def get_many(self, keys: Sequence[str]) -> List[Any]:
+        self._ensure_listener()
+
+        responses = [self.local.get(key) for key in keys]
+        missing = [index for index, response in enumerate(responses) if response is None]
+        if not missing:
+            return responses
+
+        results = await self.redis.mget([keys[index] for index in missing])
+        for index, result in zip(missing, results):
+            if not result:
+                self.remote_misses += 1
+                continue
+
+            self.remote_hits += 1
+            responses[index] = self.loads(result)
+            self.local.set(
+                keys[index], responses[index], ttl=self.local_ttl, size=len(result)
+            )
+        return responses
+
+    async def set_many(self, responses: Dict[str, Any], ttl: int = 60) -> None:
+        self._ensure_listener()
+
+        values = {key: self.dumps(response) for key, response in responses.items()}
+        await self._store_many(values, ttl=ttl)
+        for key, response in responses.items():
+            self.local.set(
+                key, response, ttl=min(self.local_ttl, ttl), size=len(values[key])
+            )
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self.local.delete(key)
+        await super().delete_many(keys)
+        await self._publish_invalidation(keys=list(keys))
+
+    async def delete_tag(self, tag: str) -> None:
+        self.local.delete_startswith(f"{tag}::")
+        await super().delete_tag(tag)
+        await self._publish_invalidation(prefix=tag)
+
+    async def delete_startswith(self, value: str) -> None:
+        self.local.delete_startswith(f"{value}::")
+        await super().delete_startswith(value)
+        await self._publish_invalidation(prefix=value)
+
+    def stats(self) -> dict:
+        remote_lookups = self.remote_hits + self.remote_misses
+        return dict(
+            local=self.local.info(),
+            redis=dict(
+                hits=self.remote_hits,
+                misses=self.remote_misses,
+                hit_ratio=self.remote_hits / remote_lookups if remote_lookups else 0.0,
+            ),
+            pool=self.pool_stats(),
+        )
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await super().close()
+
+    async def _publish_invalidation(
+        self, prefix: str = None, keys: List[str] = None
+    ) -> None:
+        await self.redis.publish(
+            self.channel,
+            ujson.dumps({"origin": self.origin, "prefix": prefix, "keys": keys}),
+        )
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    self._on_invalidation(message["data"])
+            except (RedisError, OSError) as error:
+                logger.warning("Cache invalidation channel lost: %s", error)
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    def _on_invalidation(self, data: bytes) -> None:
+        try:
+            message = ujson.loads(data)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        if message.get("prefix") is not None:
+            self.local.delete_startswith(f"{message['prefix']}::")
+        for key in message.get("keys") or ():
+            self.local.delete(key)
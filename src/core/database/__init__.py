@@ -1,6 +1,9 @@
+from .budget import QueryBudget
 from .session import (
     Base,
+    get_pool_stats,
     get_session,
+    replicas,
     reset_session_context,
     session,
     set_session_context,
@@ -11,10 +14,13 @@ from .transactional import Propagation, Transactional
 __all__ = [
     "Base",
     "session",
+    "replicas",
     "get_session",
+    "get_pool_stats",
     "set_session_context",
     "reset_session_context",
     "standalone_session",
     "Transactional",
     "Propagation",
+    "QueryBudget",
 ]
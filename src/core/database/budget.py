@@ -0,0 +1,192 @@
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.util import greenlet_spawn
+
+from core.config import config
+from core.exceptions import QueryBudgetExceededException
+
+QUERY_CANCELED = "57014"
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+class QueryBudget:
+    """
+    Database limits of a request.
+
+    Used as a route dependency it replaces the global limits from `Config`
+    for that route; limits left as None keep their global value. Timeouts
+    are in milliseconds and are applied with ``SET LOCAL`` to every
+    transaction of the request, including one an earlier dependency already
+    began. 0 disables a limit.
+
+    :param statement_timeout: Milliseconds a single statement may run.
+    :param lock_timeout: Milliseconds a statement may wait for a lock.
+    :param max_queries: Statements the request may execute.
+    :param max_rows: Rows the request may fetch. Rows streamed through a
+        server-side cursor, e.g. by ``stream()``, have no row count and are
+        not counted; bound such queries with ``max_queries`` and their
+        batch size instead.
+    """
+
+    def __init__(
+        self,
+        statement_timeout: int = None,
+        lock_timeout: int = None,
+        max_queries: int = None,
+        max_rows: int = None,
+    ):
+        self.statement_timeout = statement_timeout
+        self.lock_timeout = lock_timeout
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+
+    @classmethod
+    def default(cls) -> "QueryBudget":
+        return cls(
+            max_queries=config.DB_MAX_QUERIES_PER_REQUEST,
+            max_rows=config.DB_MAX_ROWS_PER_REQUEST,
+        )
+
+    async def __call__(self) -> None:
+        usage = budget_usage.get()
+        if usage is None:
+            usage = BudgetUsage(QueryBudget.default())
+            budget_usage.set(usage)
+
+        for name in ("statement_timeout", "lock_timeout", "max_queries", "max_rows"):
+            value = getattr(self, name)
+            if value is not None:
+                setattr(usage.budget, name, value)
+
+        if self.statement_timeout is not None or self.lock_timeout is not None:
+            for connection in usage.connections:
+                if not connection.closed and connection.in_transaction():
+                    await greenlet_spawn(set_timeouts, connection, usage.budget)
+
+
+class BudgetUsage:
+    def __init__(self, budget: QueryBudget):
+        self.budget = budget
+        self.queries = 0
+        self.rows = 0
+        self.connections: List[Connection] = []
+
+
+class BudgetMetrics:
+    def __init__(self):
+        self.queries_exceeded = 0
+        self.rows_exceeded = 0
+        self.statement_timeouts = 0
+        self.lock_timeouts = 0
+
+    def info(self) -> dict:
+        return dict(
+            queries_exceeded=self.queries_exceeded,
+            rows_exceeded=self.rows_exceeded,
+            statement_timeouts=self.statement_timeouts,
+            lock_timeouts=self.lock_timeouts,
+        )
+
+
+budget_usage: ContextVar[Optional[BudgetUsage]] = ContextVar(
+    "budget_usage", default=None
+)
+budget_metrics = BudgetMetrics()
+
+
+def start_budget() -> object:
+    """
+    Start counting the database usage of a request against the global
+    limits.
+
+    :return: A token for `end_budget`.
+    """
+    return budget_usage.set(BudgetUsage(QueryBudget.default()))
+
+
+def end_budget(token) -> None:
+    budget_usage.reset(token)
+
+
+def server_settings() -> dict:
+    """
+    The global timeouts as asyncpg server settings of new connections.
+    """
+    settings = {}
+    if config.DB_STATEMENT_TIMEOUT:
+        settings["statement_timeout"] = str(config.DB_STATEMENT_TIMEOUT)
+    if config.DB_LOCK_TIMEOUT:
+        settings["lock_timeout"] = str(config.DB_LOCK_TIMEOUT)
+    return settings
+
+
+def apply_timeouts(session, transaction, connection) -> None:
+    usage = budget_usage.get()
+    if usage is None:
+        return
+
+    if connection not in usage.connections:
+        usage.connections.append(connection)
+    set_timeouts(connection, usage.budget)
+
+
+def set_timeouts(connection: Connection, budget: QueryBudget) -> None:
+    options = {"query_budget_exempt": True}
+    if budget.statement_timeout is not None:
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(budget.statement_timeout)}",
+            execution_options=options,
+        )
+    if budget.lock_timeout is not None:
+        connection.exec_driver_sql(
+            f"SET LOCAL lock_timeout = {int(budget.lock_timeout)}",
+            execution_options=options,
+        )
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """
+    Count statements and fetched rows of the engine against the budget of
+    the current request, and turn timeouts into
+    `QueryBudgetExceededException`.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        usage = budget_usage.get()
+        if usage is None or context.execution_options.get("query_budget_exempt"):
+            return
+
+        usage.queries += 1
+        if usage.budget.max_queries and usage.queries > usage.budget.max_queries:
+            budget_metrics.queries_exceeded += 1
+            raise QueryBudgetExceededException(
+                f"Request exceeded its limit of {usage.budget.max_queries} queries"
+            )
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _count_rows(conn, cursor, statement, parameters, context, executemany):
+        usage = budget_usage.get()
+        if usage is None or cursor.description is None or cursor.rowcount < 0:
+            return
+
+        usage.rows += cursor.rowcount
+        if usage.budget.max_rows and usage.rows > usage.budget.max_rows:
+            budget_metrics.rows_exceeded += 1
+            raise QueryBudgetExceededException(
+                f"Request exceeded its limit of {usage.budget.max_rows} rows"
+            )
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _handle_timeout(context):
+        sqlstate = getattr(context.original_exception, "sqlstate", None)
+        if sqlstate == QUERY_CANCELED:
+            budget_metrics.statement_timeouts += 1
+            return QueryBudgetExceededException("Database statement timed out")
+        if sqlstate == LOCK_NOT_AVAILABLE:
+            budget_metrics.lock_timeouts += 1
+            return QueryBudgetExceededException("Database lock wait timed out")
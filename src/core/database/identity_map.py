@@ -0,0 +1,67 @@
+from typing import Any, Type, Union
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+
+IDENTITY = "identity"
+
+
+class IdentityMapStats:
+    """
+    Counters of primary key lookups served from the session identity map.
+
+    The scoped session is keyed by the session context that
+    ``SQLAlchemyMiddleware`` sets for every request, so its identity map is
+    the request-scoped cache: a row loaded once in a request is returned
+    by later lookups of the same primary key without a query.
+
+    SQLAlchemy's identity map only holds weak references, so instances
+    looked up through `get_by_identity` are also kept in
+    ``session.info["identity"]`` until the session closes. A lookup counts
+    as a hit only when the instance is loaded and not expired, i.e. when
+    no SQL is issued for it.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def queries_saved(self) -> int:
+        return self.hits
+
+    def info(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses)
+
+
+identity_map_stats = IdentityMapStats()
+
+
+async def get_by_identity(
+    session: Union[AsyncSession, async_scoped_session],
+    model: Type[Any],
+    identity: Any,
+) -> Any:
+    """
+    Return the instance with the given primary key.
+
+    The session identity map is consulted first; only when the instance is
+    not loaded in the current session, or was expired, a ``SELECT`` by
+    primary key is issued. The instance is kept for the rest of the session.
+
+    :param session: The database session.
+    :param model: The model class.
+    :param identity: The primary key value.
+    :return: The instance, or None if it does not exist.
+    """
+    key = session.identity_key(model, identity)
+    instance = session.identity_map.get(key)
+    if instance is not None and not inspect(instance).expired:
+        identity_map_stats.hits += 1
+    else:
+        identity_map_stats.misses += 1
+
+    instance = await session.get(model, identity)
+    if instance is not None:
+        session.info.setdefault(IDENTITY, {})[key] = instance
+    return instance
@@ -0,0 +1,130 @@
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.config import config
+from core.database.budget import instrument, server_settings
+
+
+class PoolMetrics:
+    """
+    Counters of an engine's connection pool, fed by pool events.
+
+    Checked out and overflow connections are gauges read from the pool;
+    wait time is the time `checkout` spent getting a connection, including
+    opening a new one.
+    """
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def info(self, pool: AsyncAdaptedQueuePool) -> dict:
+        checkouts = self.checkouts
+        return dict(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            connects=self.connects,
+            checkouts=self.checkouts,
+            checkins=self.checkins,
+            invalidations=self.invalidations,
+            timeouts=self.timeouts,
+            avg_wait_ms=self.wait_time / checkouts * 1000 if checkouts else 0.0,
+            max_wait_ms=self.max_wait_time * 1000,
+        )
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that measures how long checkouts wait for a connection.
+    """
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self) -> "TimedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def create_pooled_engine(url: str, role: str) -> AsyncEngine:
+    """
+    Create an engine with the pool settings of its role in `Config`.
+
+    :param url: The database url.
+    :param role: "writer" or "reader"; selects the ``DB_<ROLE>_*`` settings.
+    """
+    settings = f"DB_{role.upper()}"
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=getattr(config, f"{settings}_POOL_SIZE"),
+        max_overflow=getattr(config, f"{settings}_MAX_OVERFLOW"),
+        pool_timeout=getattr(config, f"{settings}_POOL_TIMEOUT"),
+        pool_pre_ping=getattr(config, f"{settings}_POOL_PRE_PING"),
+        pool_recycle=getattr(config, f"{settings}_POOL_RECYCLE"),
+        connect_args={
+            "prepared_statement_cache_size": getattr(
+                config, f"{settings}_STATEMENT_CACHE_SIZE"
+            ),
+            "server_settings": server_settings(),
+        },
+    )
+    _listen(engine)
+    instrument(engine)
+    return engine
+
+
+def pool_stats(engines: Dict[str, AsyncEngine]) -> Dict[str, dict]:
+    return {
+        name: engine.sync_engine.pool.metrics.info(engine.sync_engine.pool)
+        for name, engine in engines.items()
+    }
+
+
+def _listen(engine: AsyncEngine) -> None:
+    def metrics() -> PoolMetrics:
+        return engine.sync_engine.pool.metrics
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(*_):
+        metrics().connects += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(*_):
+        metrics().checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(*_):
+        metrics().checkins += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _invalidate(*_):
+        metrics().invalidations += 1
@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it replayed everything
+# it received or when it is not a replica at all.
+REPLICATION_LAG = text(
+    """
+    SELECT COALESCE(
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END,
+        0
+    )
+    """
+)
+
+
+class ReplicaSet:
+    """
+    Read replicas the session routes reads to.
+
+    Replicas are picked round-robin or by the fewest checked out
+    connections. A background monitor marks replicas that fail the health
+    query or lag more than ``max_lag`` seconds as unhealthy; while no
+    replica is healthy, `choose` returns None and reads go to the writer.
+    """
+
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        selection: str = "round_robin",
+        max_lag: float = 10,
+        check_interval: float = 5,
+    ):
+        if selection not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica selection: {selection}")
+
+        self.engines = engines
+        self.selection = selection
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy: List[AsyncEngine] = list(engines)
+        self.lag: Dict[str, Optional[float]] = {}
+        self._counter = itertools.count()
+        self._monitor: Optional[asyncio.Task] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self) -> Optional[AsyncEngine]:
+        healthy = self.healthy
+        if not healthy:
+            return None
+        if self.selection == "least_connections":
+            return min(
+                healthy, key=lambda engine: engine.sync_engine.pool.checkedout()
+            )
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check(self) -> None:
+        healthy = []
+        for engine in self.engines:
+            name = engine.url.render_as_string(hide_password=True)
+            try:
+                async with engine.connect() as connection:
+                    lag = float(await connection.scalar(REPLICATION_LAG))
+            except Exception as error:
+                logger.warning("Replica %s is unavailable: %s", name, error)
+                self.lag[name] = None
+                continue
+
+            self.lag[name] = lag
+            if lag > self.max_lag:
+                logger.warning("Replica %s lags %.1f seconds behind", name, lag)
+                continue
+            healthy.append(engine)
+        self.healthy = healthy
+
+    def start(self) -> None:
+        if self.engines and self._monitor is None:
+            self._monitor = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._monitor is None:
+            return
+        self._monitor.cancel()
+        try:
+            await self._monitor
+        except asyncio.CancelledError:
+            pass
+        self._monitor = None
+
+    def info(self) -> dict:
+        return dict(
+            replicas=len(self.engines),
+            healthy=len(self.healthy),
+            lag=dict(self.lag),
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
@@ -1,15 +1,17 @@
 from contextvars import ContextVar, Token
 from typing import Union
 
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_scoped_session,
-    create_async_engine,
-)
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy import event
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
-from sqlalchemy.sql.expression import Delete, Insert, Update
+from sqlalchemy.sql.expression import Delete, Insert, Select, TextClause, Update
 
 from core.config import config
+from core.database.budget import apply_timeouts
+from core.database.identity_map import IDENTITY
+from core.database.pool import create_pooled_engine, pool_stats
+from core.database.replicas import ReplicaSet
+from core.orm.transaction import PENDING_COMMIT
 
 session_context: ContextVar[str] = ContextVar("session_context")
 
@@ -27,17 +29,80 @@ def reset_session_context(context: Token) -> None:
 
 
 engines = {
-    "writer": create_async_engine(config.POSTGRES_URL, pool_recycle=3600),
-    "reader": create_async_engine(config.POSTGRES_URL, pool_recycle=3600),
+    "writer": create_pooled_engine(config.POSTGRES_URL, role="writer"),
 }
 
+replicas = ReplicaSet(
+    engines=[
+        create_pooled_engine(url, role="reader")
+        for url in config.POSTGRES_REPLICA_URLS
+    ],
+    selection=config.DB_REPLICA_SELECTION,
+    max_lag=config.DB_REPLICA_MAX_LAG,
+    check_interval=config.DB_REPLICA_CHECK_INTERVAL,
+)
+
+
+def get_pool_stats() -> dict:
+    """
+    Get the pool metrics of the writer and every replica engine.
+
+    Replicas are named by their position in ``POSTGRES_REPLICA_URLS``, so
+    the metrics don't expose their hosts or users.
+    """
+    named = dict(engines)
+    for index, engine in enumerate(replicas.engines):
+        named[f"reader-{index}"] = engine
+    return pool_stats(named)
+
 
 class RoutingSession(Session):
+    """
+    Session that sends writes to the primary and reads to a replica.
+
+    A session keeps the replica it picked first. Once it has written, all
+    its later statements go to the writer, so a request reads its own
+    writes. Locking reads go to the writer as well, and so does everything
+    inside a `Transactional` boundary or while no replica is healthy.
+
+    Raw SQL goes to the writer unless it is marked with
+    ``execution_options(readonly=True)``, which sends it to the replica.
+    Raw SQL starting with SELECT only uses the writer for that statement;
+    any other raw SQL counts as a write.
+    """
+
     def get_bind(self, mapper=None, clause=None, **kwargs):
-        if self._flushing or isinstance(clause, (Update, Delete, Insert)):
+        if self.info.get("writer") or self._is_write(clause):
+            self.info["writer"] = True
             return engines["writer"].sync_engine
-        return engines["reader"].sync_engine
+        if isinstance(clause, TextClause) and not self._is_readonly(clause):
+            return engines["writer"].sync_engine
+
+        reader = self.info.get("reader")
+        if reader is None:
+            reader = replicas.choose() or engines["writer"]
+            self.info["reader"] = reader
+        return reader.sync_engine
+
+    def _is_write(self, clause) -> bool:
+        if self._flushing or isinstance(clause, (Update, Delete, Insert)):
+            return True
+        if isinstance(clause, TextClause):
+            return not self._is_readonly(clause) and not (
+                clause.text.lstrip()[:6].upper() == "SELECT"
+            )
+        return isinstance(clause, Select) and clause._for_update_arg is not None
+
+    @staticmethod
+    def _is_readonly(clause) -> bool:
+        return clause.get_execution_options().get("readonly", False)
+
+    def close(self) -> None:
+        self.info.pop(IDENTITY, None)
+        super().close()
+
 
+event.listen(RoutingSession, "after_begin", apply_timeouts)
 
 async_session_factory = sessionmaker(
     class_=AsyncSession,
@@ -56,12 +121,32 @@ async def get_session() -> Union[AsyncSession, async_scoped_session]:
     Get the database session.
     This can be used for dependency injection.
 
+    The scoped session is only created when it is first used, so requests
+    that never query the database do not open or close one.
+
     :return: The database session.
     """
     try:
         yield session
     finally:
-        await session.close()
+        if session.registry.has():
+            await session.close()
+
+
+async def commit_unit_of_work() -> None:
+    """
+    Commit the writes of the current session at the end of a request or
+    standalone task.
+
+    Only applies with ``ORM_AUTOCOMMIT`` disabled, where writes made outside
+    a `Transactional` boundary are flushed but not committed.
+    """
+    if config.ORM_AUTOCOMMIT or not session.registry.has():
+        return
+    if session.info.pop(PENDING_COMMIT, False) or (
+        session.new or session.dirty or session.deleted
+    ):
+        await session.commit()
 
 
 Base = declarative_base()
@@ -1,6 +1,11 @@
 from uuid import uuid4
 
-from .session import reset_session_context, session, set_session_context
+from .session import (
+    commit_unit_of_work,
+    reset_session_context,
+    session,
+    set_session_context,
+)
 
 
 def standalone_session(func):
@@ -10,6 +15,7 @@ def standalone_session(func):
 
         try:
             await func(*args, **kwargs)
+            await commit_unit_of_work()
         except Exception as exception:
             await session.rollback()
             raise exception
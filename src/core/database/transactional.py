@@ -1,55 +1,156 @@
+import asyncio
+import random
 from enum import Enum
 from functools import wraps
+from uuid import uuid4
 
+from sqlalchemy.exc import InvalidRequestError
+
+from core.config import config
 from core.database import session
+from core.database.session import reset_session_context, set_session_context
+from core.orm.transaction import in_transaction, transaction_depth
+
+SERIALIZATION_FAILURE = "40001"
+DEADLOCK_DETECTED = "40P01"
 
 
 class Propagation(Enum):
     REQUIRED = "required"
     REQUIRED_NEW = "required_new"
+    NESTED = "nested"
+
+
+def is_retryable(exception: Exception) -> bool:
+    sqlstate = getattr(getattr(exception, "orig", None), "sqlstate", None)
+    return sqlstate in (SERIALIZATION_FAILURE, DEADLOCK_DETECTED)
 
 
 class Transactional:
-    def __init__(self, propagation: Propagation = Propagation.REQUIRED):
+    """
+    Run the decorated coroutine in a transaction.
+
+    - ``REQUIRED`` joins the surrounding transaction, or starts one. Only
+      the outermost boundary commits or rolls back.
+    - ``NESTED`` runs inside a savepoint of the surrounding transaction, so
+      its failure rolls back only its own work; without a surrounding
+      transaction it behaves like ``REQUIRED``.
+    - ``REQUIRED_NEW`` runs in a new session on its own connection, which
+      commits independently of the caller's transaction.
+
+    The outermost boundary pins the session to the writer, so reads inside
+    a transaction never see replica lag; keep read-only code outside of
+    ``Transactional`` to serve it from a replica.
+
+    The outermost boundary retries the whole call on serialization failures
+    and deadlocks, up to ``retries`` times with jittered backoff, so the
+    decorated coroutine must be safe to run again.
+
+    :param propagation: How the call relates to a surrounding transaction.
+    :param isolation_level: Isolation level of the transaction, e.g.
+        "SERIALIZABLE". The isolation level of a running transaction can't
+        change, so such boundaries run in a new session on the writer like
+        ``REQUIRED_NEW`` and can't be used inside another boundary.
+    :param retries: Retries on serialization failures and deadlocks;
+        defaults to ``DB_TRANSACTION_RETRIES``.
+    """
+
+    def __init__(
+        self,
+        propagation: Propagation = Propagation.REQUIRED,
+        isolation_level: str = None,
+        retries: int = None,
+    ):
         self.propagation = propagation
+        self.isolation_level = isolation_level
+        self.retries = config.DB_TRANSACTION_RETRIES if retries is None else retries
 
     def __call__(self, function):
         @wraps(function)
         async def decorator(*args, **kwargs):
+            if (
+                self.isolation_level
+                and self.propagation != Propagation.REQUIRED_NEW
+                and in_transaction()
+            ):
+                raise InvalidRequestError(
+                    f"Can't run {function.__qualname__} with isolation level "
+                    f"{self.isolation_level} inside a running transaction"
+                )
+            if self.propagation == Propagation.REQUIRED_NEW or self.isolation_level:
+                return await self._run_required_new(
+                    function=function,
+                    args=args,
+                    kwargs=kwargs,
+                )
+            if in_transaction() and self.propagation == Propagation.NESTED:
+                return await self._run_nested(
+                    function=function,
+                    args=args,
+                    kwargs=kwargs,
+                )
+            if in_transaction():
+                return await function(*args, **kwargs)
+            return await self._run_required(
+                function=function,
+                args=args,
+                kwargs=kwargs,
+            )
+
+        return decorator
+
+    async def _run_required(self, function, args, kwargs):
+        if self.isolation_level and session.in_transaction():
+            raise InvalidRequestError(
+                "Can't set the isolation level of a session that already "
+                "began a transaction"
+            )
+
+        attempt = 0
+        while True:
+            depth = transaction_depth.set(1)
             try:
-                if self.propagation == Propagation.REQUIRED:
-                    result = await self._run_required(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
-                    )
-                elif self.propagation == Propagation.REQUIRED_NEW:
-                    result = await self._run_required_new(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
-                    )
-                else:
-                    result = await self._run_required(
-                        function=function,
-                        args=args,
-                        kwargs=kwargs,
+                session.info["writer"] = True
+                if self.isolation_level:
+                    await session.connection(
+                        execution_options={"isolation_level": self.isolation_level}
                     )
+                result = await function(*args, **kwargs)
+                await session.commit()
+                return result
             except Exception as exception:
                 await session.rollback()
-                raise exception
+                if attempt >= self.retries or not is_retryable(exception):
+                    raise exception
+            finally:
+                transaction_depth.reset(depth)
 
-            return result
+            attempt += 1
+            await asyncio.sleep(self._backoff(attempt))
 
-        return decorator
+    async def _run_nested(self, function, args, kwargs):
+        depth = transaction_depth.set(transaction_depth.get() + 1)
+        try:
+            async with session.begin_nested():
+                return await function(*args, **kwargs)
+        finally:
+            transaction_depth.reset(depth)
 
-    async def _run_required(self, function, args, kwargs) -> None:
-        result = await function(*args, **kwargs)
-        await session.commit()
-        return result
+    async def _run_required_new(self, function, args, kwargs):
+        context = set_session_context(session_id=str(uuid4()))
+        depth = transaction_depth.set(0)
+        try:
+            return await self._run_required(
+                function=function,
+                args=args,
+                kwargs=kwargs,
+            )
+        finally:
+            await session.remove()
+            transaction_depth.reset(depth)
+            reset_session_context(context=context)
 
-    async def _run_required_new(self, function, args, kwargs) -> None:
-        session.begin()
-        result = await function(*args, **kwargs)
-        await session.commit()
-        return result
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        ceiling = min(config.DB_TRANSACTION_RETRY_BACKOFF * 2**attempt, 1)
+        return random.uniform(0, ceiling)
@@ -4,6 +4,7 @@ from .base import (
     DuplicateValueException,
     ForbiddenException,
     NotFoundException,
+    QueryBudgetExceededException,
     UnauthorizedException,
     UnprocessableEntity
 )
@@ -18,5 +19,6 @@ __all__ = [
     "UnauthorizedException",
     "UnprocessableEntity",
     "DuplicateValueException",
+    "QueryBudgetExceededException",
     "PostgresError"
 ]
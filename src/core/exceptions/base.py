@@ -45,3 +45,9 @@ class DuplicateValueException(CustomException):
     code = HTTPStatus.UNPROCESSABLE_ENTITY
     error_code = HTTPStatus.UNPROCESSABLE_ENTITY
     message = HTTPStatus.UNPROCESSABLE_ENTITY.description
+
+
+class QueryBudgetExceededException(CustomException):
+    code = HTTPStatus.SERVICE_UNAVAILABLE
+    error_code = HTTPStatus.SERVICE_UNAVAILABLE
+    message = "Request exceeded its database budget"
@@ -1,9 +1,10 @@
 from .authentication import AuthBackend, AuthenticationMiddleware
 from .response_logger import ResponseLoggerMiddleware
-from .sqlalchemy import SQLAlchemyMiddleware
+from .sqlalchemy import SQLAlchemyMiddleware, skip_db_session
 
 __all__ = [
     "SQLAlchemyMiddleware",
+    "skip_db_session",
     "ResponseLoggerMiddleware",
     "AuthenticationMiddleware",
     "AuthBackend",
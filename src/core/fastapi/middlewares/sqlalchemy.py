@@ -1,26 +1,83 @@
+from typing import Callable, Iterable, List, Optional
 from uuid import uuid4
 
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from core.database.budget import end_budget, start_budget
 from core.database.session import (
+    commit_unit_of_work,
     reset_session_context,
     session,
     set_session_context
 )
 
 
+def skip_db_session(endpoint: Callable) -> Callable:
+    """
+    Mark an endpoint that never uses the database.
+
+    `SQLAlchemyMiddleware` does not set a session context for requests to
+    marked endpoints, so using the scoped session there raises LookupError.
+    """
+    endpoint.__skip_db_session__ = True
+    return endpoint
+
+
 class SQLAlchemyMiddleware:
-    def __init__(self, app: ASGIApp) -> None:
+    """
+    Sets a session context and a query budget for every HTTP request and
+    disposes of the request's session afterwards. With ``ORM_AUTOCOMMIT``
+    disabled, writes left uncommitted by a successful request are committed
+    before the response starts, so a failing commit still yields an error.
+
+    The scoped session itself is only created on first use, so teardown is
+    a no-op for requests that did not query the database. Requests outside
+    HTTP, CORS preflights, ``exclude_paths`` and endpoints marked with
+    `skip_db_session` get no session context at all.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ()) -> None:
         self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+        self._skipped_routes: Optional[List[BaseRoute]] = None
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._skip(scope):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await commit_unit_of_work()
+            await send(message)
+
         session_id = str(uuid4())
         context = set_session_context(session_id=session_id)
+        budget = start_budget()
 
         try:
-            await self.app(scope, receive, send)
+            await self.app(scope, receive, send_wrapper)
         except Exception as exception:
             raise exception
         finally:
             await session.remove()
+            end_budget(budget)
             reset_session_context(context=context)
+
+    def _skip(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return True
+        if scope["path"] in self.exclude_paths:
+            return True
+
+        if self._skipped_routes is None:
+            self._skipped_routes = [
+                route
+                for route in getattr(scope.get("app"), "routes", ())
+                if getattr(route, "endpoint", None) is not None
+                and getattr(route.endpoint, "__skip_db_session__", False)
+            ]
+        return any(
+            route.matches(scope)[0] == Match.FULL for route in self._skipped_routes
+        )
@@ -1,23 +1,41 @@
-from typing import (Union, Sequence, Tuple)
+from typing import (AsyncIterator, Union, Sequence, Tuple)
 
 from sqlalchemy import (
+    Integer,
+    bindparam,
     select,
     and_,
-    func
+    or_,
+    func,
+    true,
+    tuple_
 )
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.orm import RelationshipProperty, joinedload
+from sqlalchemy.sql.elements import ClauseElement
 from sqlalchemy.sql.selectable import Select
 
-from .utils import get_association_id_column
+from .pagination import decode_cursor, encode_cursor
+from .statement_cache import StatementCache
+
+_UNCACHEABLE = object()
 
 
 class BaseQuery:
+    """
+    Query builder shared by the model managers.
+
+    Filter values never end up in the built statement: lookups are compiled
+    against ``bindparam`` placeholders and the values are collected into
+    ``params``, so statements with the same filter shape are taken from
+    ``statement_cache``. Lambdas in ``condition_map`` therefore receive the
+    placeholder, and Python-side value transforms belong in ``value_map``.
+    """
+
     needs_scalar: bool = True
     _instance = None
-    _prefetch_related_joins = []
-    _joint: list = []
     _query: Select = None
+    statement_cache = StatementCache()
     condition_map = {
         'exact': lambda column, value: column == value,
         'contains': lambda column, value: column.contains(value),
@@ -34,9 +52,9 @@ class BaseQuery:
         'month': lambda column, value: func.extract('month', column) == value,
         'day': lambda column, value: func.extract('day', column) == value,
         'iexact': lambda column, value: column.ilike(value),
-        'icontains': lambda column, value: column.ilike(f"%{value}%"),
-        'istartswith': lambda column, value: column.ilike(f"{value}%"),
-        'iendswith': lambda column, value: column.ilike(f"%{value}"),
+        'icontains': lambda column, value: column.ilike(value),
+        'istartswith': lambda column, value: column.ilike(value),
+        'iendswith': lambda column, value: column.ilike(value),
         "week": lambda f, v: func.extract("week", f) == v,
         "week_day": lambda f, v: func.extract("dow", f) == v,
         "iso_week_day": lambda f, v: func.extract("isodow", f) == v,
@@ -50,23 +68,78 @@ class BaseQuery:
         "regex": lambda f, v: f.op("~")(v),
         "iregex": lambda f, v: f.op("~*")(v),
     }
+    value_map = {
+        'icontains': lambda value: f"%{value}%",
+        'istartswith': lambda value: f"{value}%",
+        'iendswith': lambda value: f"%{value}",
+    }
 
     def __init__(self, cls):
         self.cls = cls
+        self._loader_options = []
+        self._joined_eager = False
+        self._joined_collections = False
+        self._implicit_limit = False
+        self._excludes = {}
+        self._joint = []
+        self._params = {}
+        self._keyset_fields = None
 
     def __iter__(self):
-        return self.execute(db_session=None).__iter__()
+        raise TypeError(
+            "Queries can't be iterated synchronously, use "
+            "`async for row in query.stream(db_session)` instead"
+        )
 
     async def execute(
             self, db_session: AsyncSession
     ) -> Sequence:
         if self.query is not None:
-            result = await db_session.execute(self.query)
+            result = await db_session.execute(self.query, self.params)
+            if self._joined_eager:
+                result = result.unique()
             if self.needs_scalar:
                 return result.scalars().all()
             return result.all()
         raise ValueError("Query is not built")
 
+    async def stream(
+            self, db_session: AsyncSession, batch_size: int = 1000
+    ) -> AsyncIterator:
+        """
+        Iterate over the results through a server-side cursor.
+
+        Rows are fetched ``batch_size`` at a time, so memory stays flat
+        regardless of the result size. Yields model instances, or tuples for
+        ``values_fields`` and ``select_models`` queries. The default limit
+        of 100 rows is not applied when streaming. Collections can't be
+        loaded with ``select_related`` here, since their rows would span
+        batches; use ``prefetch_related`` for them.
+
+        :param db_session: The async database session.
+        :param batch_size: The number of rows fetched per round trip.
+        """
+        if self.query is None:
+            raise ValueError("Query is not built")
+        if self._joined_collections:
+            raise ValueError(
+                "Collections loaded with select_related can't be streamed, "
+                "use prefetch_related instead"
+            )
+        query = self.query.limit(None) if self._implicit_limit else self.query
+        result = await db_session.stream(
+            query.execution_options(yield_per=batch_size), self.params
+        )
+        try:
+            if self.needs_scalar:
+                async for instance in result.scalars():
+                    yield instance
+            else:
+                async for row in result:
+                    yield tuple(row)
+        finally:
+            await result.close()
+
     @property
     def query(self) -> Select:
         return self._query
@@ -75,6 +148,14 @@ class BaseQuery:
     def query(self, value):
         self._query = value
 
+    @property
+    def params(self) -> dict:
+        return self._params
+
+    @params.setter
+    def params(self, value):
+        self._params = value
+
     @property
     def instance(self):
         return self._instance
@@ -92,20 +173,86 @@ class BaseQuery:
         distinct_fields=None,
         where=None,
         select_models=None,
+        keyset: bool = False,
+        cursor: str = None,
+        excludes: dict = None,
         **kwargs
     ) -> Select:
         """
         Build a basic query for the current model.
+
+        The statement is taken from ``statement_cache`` when a query with the
+        same shape was built before; only ``params`` are rebuilt per call.
+        In keyset mode ``skip`` is ignored and the rows following ``cursor``
+        are selected instead.
         :return: A query object.
         """
         joins = joins or set()
+        if keyset:
+            order_by = self._keyset_order(order_by)
+            skip = None
+            self._keyset_fields = order_by
+        cache_key = self._statement_cache_key(
+            joins, order_by=order_by, skip=skip, limit=limit,
+            distinct_fields=distinct_fields, where=where,
+            select_models=select_models, keyset=keyset, cursor=cursor,
+            excludes=excludes, lookups=kwargs
+        )
+        entry = None
+        if cache_key is None:
+            self.statement_cache.uncacheable += 1
+        else:
+            entry = self.statement_cache.get(cache_key)
+
+        if entry is None:
+            entry = self._compile_query(
+                joins, order_by=order_by, skip=skip, limit=limit,
+                distinct_fields=distinct_fields, where=where,
+                select_models=select_models, keyset=keyset, cursor=cursor,
+                excludes=excludes, **kwargs
+            )
+            if cache_key is not None:
+                self.statement_cache.set(cache_key, entry)
+
+        query, self.needs_scalar, joint = entry
+        self.params = self._bind_params(
+            skip=skip, limit=limit,
+            keyset_fields=order_by if keyset else None, cursor=cursor,
+            **kwargs
+        )
+        if excludes:
+            self.params.update(
+                self._bind_params(prefix="q_not", **excludes)
+            )
+        self._joint.extend(joint)
+        return query
+
+    def _compile_query(
+        self,
+        joins: set,
+        order_by=None,
+        skip: int = None,
+        limit: int = None,
+        distinct_fields=None,
+        where=None,
+        select_models=None,
+        keyset: bool = False,
+        cursor: str = None,
+        excludes: dict = None,
+        **kwargs
+    ) -> Tuple[Select, bool, tuple]:
+        """
+        Compile the statement for the given filter shape.
+
+        :return: The statement, whether it needs scalars and the joint models.
+        """
         joint = []
         if select_models is not None:
             query = select(*select_models, self.cls).select_from(self.cls)
-            self.needs_scalar = False
+            needs_scalar = False
         else:
             query = select(self.cls)
-            self.needs_scalar = True
+            needs_scalar = True
 
         if where is not None:
             query = query.where(*where)
@@ -119,8 +266,48 @@ class BaseQuery:
             query = query.join(related_model, join_condition)
             joint.append(related_model)
 
+        query, conditions = self._lookup_conditions(query, joint, kwargs)
+        if excludes:
+            query, excluded = self._lookup_conditions(
+                query, joint, excludes, prefix="q_not"
+            )
+            conditions.append(and_(*excluded).is_not(true()))
+
+        if keyset and cursor:
+            conditions.append(self._keyset_condition(order_by))
+
+        if conditions:
+            query = query.where(and_(*conditions))
+
+        if order_by:
+            query = self._apply_ordering(query, order_by)
+            query = self._apply_distinct(
+                query, distinct_fields
+            )
+        elif distinct_fields:
+            raise ValueError(
+                "You must specify order_by when using distinct_fields"
+            )
+
+        if skip:
+            query = query.offset(bindparam("q__offset", type_=Integer))
+
+        if limit:
+            query = query.limit(bindparam("q__limit", type_=Integer))
+
+        return query, needs_scalar, tuple(joint)
+
+    def _lookup_conditions(
+        self, query: Select, joint: list, lookups: dict, prefix: str = "q"
+    ) -> Tuple[Select, list]:
+        """
+        Compile ``field__lookup`` filters into conditions.
+
+        Related models referenced by the lookups are joined to the query.
+        :return: The query and the list of conditions.
+        """
         conditions = []
-        for key, value in kwargs.items():
+        for key, value in lookups.items():
             filter_parts = key.split('__')
             column_name = filter_parts[0]
             filter_type = filter_parts[-1] if len(filter_parts) > 1 else None
@@ -148,30 +335,234 @@ class BaseQuery:
                     raise ValueError("This Column does not exist")
                 column = getattr(parent_cls, filter_field)
                 conditions = self.apply_filter_type(
-                    filter_type, conditions, column, value
+                    filter_type, conditions, column,
+                    self._placeholder(key, filter_type, value, prefix)
                 )
+        return query, conditions
 
-        if conditions:
-            query = query.where(and_(*conditions))
+    def _statement_cache_key(
+        self,
+        joins: set,
+        order_by=None,
+        skip: int = None,
+        limit: int = None,
+        distinct_fields=None,
+        where=None,
+        select_models=None,
+        keyset: bool = False,
+        cursor: str = None,
+        excludes: dict = None,
+        lookups: dict = None,
+    ):
+        """
+        Build the statement cache key for the given filter shape.
 
-        if order_by:
-            query = self._apply_ordering(query, order_by)
-            query = self._apply_distinct(
-                query, distinct_fields
+        :return: A hashable key, or None when the query can't be cached.
+        """
+        if where is not None:
+            return None
+
+        join_keys = []
+        for join_condition in joins:
+            join_key = join_condition._generate_cache_key()
+            if join_key is None or join_key.bindparams:
+                return None
+            join_keys.append(join_key.key)
+
+        lookup_shapes = []
+        for kind, items in (("filter", lookups), ("exclude", excludes)):
+            for key, value in (items or {}).items():
+                filter_type = key.rsplit('__', 1)[-1] if '__' in key else None
+                shape = self._value_shape(filter_type, value)
+                if shape is _UNCACHEABLE:
+                    return None
+                lookup_shapes.append((kind, key, shape))
+
+        cache_key = (
+            self.cls,
+            frozenset(join_keys),
+            tuple(order_by) if isinstance(order_by, list) else order_by,
+            tuple(distinct_fields) if isinstance(
+                distinct_fields, list
+            ) else distinct_fields,
+            tuple(select_models) if isinstance(
+                select_models, list
+            ) else select_models,
+            bool(skip),
+            bool(limit),
+            keyset,
+            bool(cursor),
+            tuple(lookup_shapes),
+        )
+        try:
+            hash(cache_key)
+        except TypeError:
+            return None
+        return cache_key
+
+    @staticmethod
+    def _value_shape(filter_type: str, value):
+        """
+        Return the part of a lookup value that changes the statement itself.
+        """
+        if isinstance(value, ClauseElement):
+            return _UNCACHEABLE
+        if filter_type == "isnull":
+            return bool(value)
+        if value is None:
+            return "null"
+        return "bind"
+
+    @staticmethod
+    def _is_bindable(filter_type: str, value) -> bool:
+        return (
+            filter_type != "isnull"
+            and value is not None
+            and not isinstance(value, ClauseElement)
+        )
+
+    @staticmethod
+    def _param_name(key: str, prefix: str = "q") -> str:
+        return f"{prefix}_{key}"
+
+    def _placeholder(
+        self, key: str, filter_type: str, value, prefix: str = "q"
+    ):
+        """
+        Return the bind placeholder used in place of a lookup value.
+        """
+        if not self._is_bindable(filter_type, value):
+            return value
+        name = self._param_name(key, prefix)
+        if filter_type == "range":
+            return bindparam(f"{name}_0"), bindparam(f"{name}_1")
+        if filter_type == "in":
+            return bindparam(name, expanding=True)
+        return bindparam(name)
+
+    def _bind_params(
+        self,
+        skip: int = None,
+        limit: int = None,
+        keyset_fields: tuple = None,
+        cursor: str = None,
+        prefix: str = "q",
+        **kwargs
+    ) -> dict:
+        """
+        Collect the execution parameters for the placeholders of a query.
+        """
+        params = {}
+        for key, value in kwargs.items():
+            filter_type = key.rsplit('__', 1)[-1] if '__' in key else None
+            if not self._is_bindable(filter_type, value):
+                continue
+            name = self._param_name(key, prefix)
+            if filter_type == "range":
+                params[f"{name}_0"], params[f"{name}_1"] = value
+            elif filter_type == "in":
+                params[name] = list(value)
+            elif filter_type in self.value_map:
+                params[name] = self.value_map[filter_type](value)
+            else:
+                params[name] = value
+        if skip:
+            params["q__offset"] = skip
+        if limit:
+            params["q__limit"] = limit
+        if keyset_fields and cursor:
+            values = decode_cursor(
+                cursor, keyset_fields, self._keyset_columns(keyset_fields)
             )
-        elif distinct_fields:
-            raise ValueError(
-                "You must specify order_by when using distinct_fields"
+            for index, value in enumerate(values):
+                params[f"q__cursor_{index}"] = value
+        return params
+
+    def _keyset_order(self, order_by) -> Tuple[str, ...]:
+        """
+        Return the keyset ordering: order_by with the primary key appended
+        in the direction of the last field.
+
+        :param order_by: A string or tuple of strings indicating orderby col.
+        :return: A tuple of order fields ending with the primary key.
+        """
+        if order_by == "?":
+            raise ValueError("Random ordering can't be used with keyset")
+        order_by = (order_by,) if isinstance(order_by, str) else order_by
+        fields = tuple(order_by or ())
+        pk_name = self.cls.__mapper__.get_property_by_column(
+            self.cls.__mapper__.primary_key[0]
+        ).key
+        if not any(field.lstrip("-") == pk_name for field in fields):
+            descending = bool(fields) and fields[-1].startswith("-")
+            fields += (f"-{pk_name}" if descending else pk_name,)
+        return fields
+
+    def _keyset_columns(self, fields: Sequence[str]) -> list:
+        return [getattr(self.cls, field.lstrip("-")) for field in fields]
+
+    def _keyset_condition(self, fields: Sequence[str]):
+        """
+        Build the condition selecting the rows after the cursor row.
+
+        Uniform orderings use a row-value comparison, which Postgres can
+        serve from a composite index; mixed directions expand into OR terms.
+        Keyset columns are expected to be non-nullable.
+        """
+        columns = self._keyset_columns(fields)
+        descending = [field.startswith("-") for field in fields]
+        placeholders = [
+            bindparam(f"q__cursor_{index}", type_=column.type)
+            for index, column in enumerate(columns)
+        ]
+        if all(descending) or not any(descending):
+            if descending[0]:
+                return tuple_(*columns) < tuple_(*placeholders)
+            return tuple_(*columns) > tuple_(*placeholders)
+
+        terms = []
+        for index, (column, placeholder) in enumerate(
+            zip(columns, placeholders)
+        ):
+            equal = [
+                columns[prev] == placeholders[prev] for prev in range(index)
+            ]
+            after = (
+                column < placeholder if descending[index]
+                else column > placeholder
             )
+            terms.append(and_(*equal, after))
+        return or_(*terms)
 
-        if skip:
-            query = query.offset(skip)
+    def next_cursor(self, results: Sequence):
+        """
+        Return the cursor of the page following the given keyset results.
 
-        if limit:
-            query = query.limit(limit)
+        :param results: The rows returned for the current page.
+        :return: An opaque cursor, or None when there is no next page.
+        """
+        limit = self.params.get("q__limit")
+        if not self._keyset_fields or not results or (
+            limit and len(results) < limit
+        ):
+            return None
+        last = results[-1]
+        return encode_cursor(
+            self._keyset_fields,
+            [getattr(last, field.lstrip("-")) for field in self._keyset_fields]
+        )
 
-        self._joint.extend(joint)
-        return query
+    def _bound_whereclause(self):
+        """
+        Return the WHERE clause of the current query with params applied.
+
+        Used by bulk UPDATE/DELETE, where the ORM evaluates the criteria in
+        Python to synchronize the session and needs the actual values.
+        """
+        whereclause = self.query.whereclause
+        if whereclause is not None and self.params:
+            whereclause = whereclause.params(self.params)
+        return whereclause
 
     def build_handler(
         self,
@@ -182,6 +573,8 @@ class BaseQuery:
         distinct_fields=None,
         where=None,
         select_models=None,
+        keyset: bool = False,
+        cursor: str = None,
         **kwargs
     ) -> Select:
         """
@@ -190,12 +583,14 @@ class BaseQuery:
         :return: A query handler.
         """
         joins = joins or set()
+        self._implicit_limit = not limit
         limit = limit or 100
         skip = skip or 0
         cached_query = self._build_query(
             joins, skip=skip, limit=limit, order_by=order_by,
             distinct_fields=distinct_fields, where=where,
-            select_models=select_models, **kwargs
+            select_models=select_models, keyset=keyset, cursor=cursor,
+            excludes=self._excludes, **kwargs
         )
         return cached_query
 
@@ -212,34 +607,64 @@ class BaseQuery:
             and field.property.secondary is not None
         )
 
-    def _apply_prefetch_related(self, query):
-        for prefetch_joins in self._prefetch_related_joins:
-            if len(prefetch_joins) == 2:
-                related_model, association_table = prefetch_joins
-                related_model_id, association_related_id = (
-                    get_association_id_column(association_table, related_model)
+    def _relationship_name(self, related_model) -> str:
+        """
+        Return the name of the relationship pointing at the given model.
+        """
+        name = next(
+            (
+                relationship.key for relationship
+                in self.cls.__mapper__.relationships
+                if relationship.mapper.class_ is related_model
+            ), None
+        )
+        if name is None:
+            raise ValueError(
+                f"No relationship between model {self.cls.__name__} "
+                f"and {related_model.__name__}"
+            )
+        return name
+
+    def _loader_option(self, loader, relation):
+        """
+        Build a loader option for a relationship path.
+
+        :param loader: ``joinedload`` or ``selectinload``.
+        :param relation: A relationship name, nested ones separated by
+            ``__``, or a related model.
+        :return: The loader option.
+        """
+        if not isinstance(relation, str):
+            relation = self._relationship_name(relation)
+
+        model, option = self.cls, None
+        for name in relation.split("__"):
+            if not (
+                hasattr(model, name) and self.is_relationship_field(model, name)
+            ):
+                raise ValueError(
+                    f"No relationship '{name}' in class '{model.__name__}'"
                 )
-                self_model_id_column, association_self_id = (
-                        get_association_id_column(association_table, self.cls)
-                    )
-
-                if association_table not in self._joint:
-                    query = query.join(
-                        association_table,
-                        self_model_id_column == association_self_id
-                    )
-                    self._joint.append(association_table)
-
-                if related_model not in self._joint:
-                    query = query.join(
-                        related_model,
-                        related_model_id == association_related_id
-                    )
-                    self._joint.append(related_model)
-
-            elif len(prefetch_joins) == 1:
-                query = query.join(prefetch_joins)
-        return query
+            attr = getattr(model, name)
+            if loader is joinedload and attr.property.uselist:
+                self._joined_collections = True
+            option = (
+                loader(attr) if option is None
+                else getattr(option, loader.__name__)(attr)
+            )
+            model = attr.property.mapper.class_
+        return option
+
+    def _add_loader_options(self, loader, relations) -> "BaseQuery":
+        options = [
+            self._loader_option(loader, relation) for relation in relations
+        ]
+        self._loader_options.extend(options)
+        if loader is joinedload:
+            self._joined_eager = True
+        if self.query is not None and self.needs_scalar:
+            self.query = self.query.options(*options)
+        return self
 
     def apply_filter_type(
         self,
@@ -0,0 +1,23 @@
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+
+class Explain(Executable, ClauseElement):
+    """
+    ``EXPLAIN (FORMAT JSON)`` wrapper around a statement.
+
+    Binds of the wrapped statement are compiled as usual, so it is executed
+    with the same parameters as the statement itself.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kwargs) -> str:
+    statement = compiler.process(element.statement, **kwargs)
+    return f"EXPLAIN (FORMAT JSON) {statement}"
@@ -0,0 +1,86 @@
+import base64
+import datetime
+import enum
+from decimal import Decimal
+from typing import Any, Sequence, Tuple
+from uuid import UUID
+
+import ujson
+
+from core.exceptions import BadRequestException
+
+_DECODERS = {
+    datetime.datetime: datetime.datetime.fromisoformat,
+    datetime.date: datetime.date.fromisoformat,
+    datetime.time: datetime.time.fromisoformat,
+    UUID: UUID,
+    Decimal: Decimal,
+}
+
+
+class InvalidCursorException(BadRequestException):
+    message = "Invalid pagination cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _decode_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type):
+        return value
+    if python_type in _DECODERS:
+        return _DECODERS[python_type](value)
+    return python_type(value)
+
+
+def encode_cursor(fields: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    Encode the keyset of the last row of a page into an opaque cursor.
+
+    :param fields: The order_by fields the keyset was taken from.
+    :param values: The values of those fields in the last row.
+    :return: A url-safe cursor string.
+    """
+    payload = ujson.dumps(
+        {"o": list(fields), "v": [_encode_value(value) for value in values]}
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, fields: Sequence[str], columns: Sequence
+) -> Tuple[Any, ...]:
+    """
+    Decode a cursor built by `encode_cursor` for the given ordering.
+
+    :param cursor: The cursor received from the client.
+    :param fields: The order_by fields of the current query.
+    :param columns: The columns of those fields, used to restore the types.
+    :return: The keyset values of the last row of the previous page.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = ujson.loads(base64.urlsafe_b64decode(cursor + padding))
+        if payload["o"] != list(fields) or len(payload["v"]) != len(fields):
+            raise InvalidCursorException()
+        return tuple(
+            _decode_value(column, value)
+            for column, value in zip(columns, payload["v"])
+        )
+    except InvalidCursorException:
+        raise
+    except Exception as error:
+        raise InvalidCursorException() from error
@@ -1,21 +1,33 @@
-from typing import Type, Union, Tuple, Any, List
+import json
+from typing import Type, Union, Tuple, Any, List, Optional, Sequence
+from uuid import uuid4
 
 
 from sqlalchemy import (
     select,
+    text,
+    tuple_,
+    column as sqla_column,
     delete as sqla_delete,
+    table as sqla_table,
     update as sqla_update,
+    values as sqla_values,
 )
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
-from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.orm import RelationshipProperty, joinedload, selectinload
 
+from core.config import config
 
 from .signals import SignalMixin
 from .base import BaseQuery
+from .explain import Explain
+from .transaction import PENDING_COMMIT, in_transaction
 
 
 class QueryMixin(BaseQuery, SignalMixin):
+    _filter_args: dict = None
 
     async def get(
         self,
@@ -31,7 +43,11 @@ class QueryMixin(BaseQuery, SignalMixin):
             limit=1,
             **kwargs
         )
-        result = await db_session.execute(self.query)
+        if self._loader_options:
+            self.query = self.query.options(*self._loader_options)
+        result = await db_session.execute(self.query, self.params)
+        if self._joined_eager:
+            result = result.unique()
         self.instance = result.scalars().first()
         return self.instance
 
@@ -45,34 +61,121 @@ class QueryMixin(BaseQuery, SignalMixin):
         where=None,
         select_models=None,
         distinct_fields=None,
+        keyset: bool = False,
+        cursor: str = None,
         **kwargs
     ) -> Union[Type[Any], Type["QueryMixin"]]:
+        """
+        Build a filtered query for the model.
+
+        With ``keyset`` enabled the results are paginated by ``cursor``
+        instead of ``skip``: rows are ordered by ``order_by`` plus the
+        primary key and ``next_cursor`` returns the cursor of the next page.
+        """
+        self._filter_args = dict(
+            joins=joins, order_by=order_by, skip=skip,
+            values_fields=values_fields, limit=limit, where=where,
+            select_models=select_models, distinct_fields=distinct_fields,
+            keyset=keyset, cursor=cursor, **kwargs
+        )
         self.query = self.build_handler(
             joins=joins, order_by=order_by, skip=skip, where=where,
             distinct_fields=distinct_fields, select_models=select_models,
-            limit=limit, **kwargs
+            limit=limit, keyset=keyset or cursor is not None, cursor=cursor,
+            **kwargs
         )
 
         if values_fields:
             self.query = self.query.with_only_columns(
                 *[getattr(self.cls, field) for field in values_fields]
             )
-        if hasattr(self, "_prefetch_related_joins"):
-            self.query = self._apply_prefetch_related(self.query)
+            self.needs_scalar = False
+        elif self._loader_options and self.needs_scalar:
+            self.query = self.query.options(*self._loader_options)
         return self
 
     async def count(self, db_session: AsyncSession) -> int:
         modified_query = self.query.limit(None).offset(None)
         subquery = modified_query.subquery()
         count_stmt = select(func.count()).select_from(subquery)
-        result = await db_session.execute(count_stmt)
+        result = await db_session.execute(count_stmt, self.params)
         return result.scalar()
 
+    async def execute_with_count(
+        self, db_session: AsyncSession
+    ) -> Tuple[Sequence, int]:
+        """
+        Fetch the results together with the total count in one statement.
+
+        The total is computed with ``count(*) OVER ()`` over the filtered
+        rows, so it ignores limit/offset but not the keyset cursor. The
+        window is taken before DISTINCT is applied, and collections loaded
+        with ``select_related`` multiply the rows, so such queries are
+        counted with a separate count query instead.
+
+        :param db_session: The async database session.
+        :return: A tuple of the results and the total count.
+        """
+        if self._joined_collections or self.query._distinct:
+            return await self.execute(db_session), await self.count(db_session)
+
+        query = self.query.add_columns(
+            func.count().over().label("total_count")
+        )
+        result = await db_session.execute(query, self.params)
+        if self._joined_eager:
+            result = result.unique()
+        rows = result.all()
+        if not rows:
+            if self.params.get("q__offset"):
+                return [], await self.count(db_session)
+            return [], 0
+
+        if self.needs_scalar:
+            results = [row[0] for row in rows]
+        else:
+            results = [tuple(row[:-1]) for row in rows]
+        return results, rows[0][-1]
+
+    async def estimated_count(self, db_session: AsyncSession) -> int:
+        """
+        Estimate the count of the query from the planner statistics.
+
+        Unfiltered queries read ``pg_class.reltuples``, filtered ones the row
+        estimate of ``EXPLAIN``. Falls back to the exact count for tables
+        that were never analyzed.
+
+        :param db_session: The async database session.
+        :return: The estimated number of rows.
+        """
+        query = self.query.limit(None).offset(None)
+        if query.whereclause is None and not self._joint:
+            result = await db_session.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = CAST(:table_name AS regclass)"
+                ).execution_options(readonly=True),
+                {"table_name": self.cls.__table__.fullname},
+            )
+            estimate = result.scalar()
+        else:
+            result = await db_session.execute(Explain(query), self.params)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+
+        if estimate is None or estimate < 0:
+            return await self.count(db_session)
+        return int(estimate)
+
     async def create(
         self,
         db_session: AsyncSession,
+        commit: Optional[bool] = None,
         **kwargs
     ) -> Union[Type[Any], Type["QueryMixin"]]:
+        commit = self._autocommit(commit)
         self.instance = self.cls()
         for key, value in kwargs.items():
             attr = getattr(self.cls, key, None)
@@ -92,12 +195,11 @@ class QueryMixin(BaseQuery, SignalMixin):
 
         # self.instance = await self._pre_save(db_session, instance, **kwargs)
         try:
-            async with db_session.begin_nested():
-                db_session.add(self.instance)
-                await db_session.flush()
-                await db_session.commit()
+            db_session.add(self.instance)
+            await self._save(db_session, commit)
         except Exception as error:
-            await db_session.rollback()
+            if commit:
+                await db_session.rollback()
             raise error
         return self.instance
 
@@ -115,22 +217,30 @@ class QueryMixin(BaseQuery, SignalMixin):
         self,
         db_session: AsyncSession,
         joins: set = None,
+        commit: Optional[bool] = None,
+        returning: bool = False,
         **kwargs
-    ) -> int:
+    ) -> Union[int, list]:
         """
         Delete instances matching the given filters.
         :param db_session: The async database session.
+        :param commit: Commit the deletion, see `_autocommit`.
+        :param returning: Return the deleted instances, loaded by
+            ``DELETE ... RETURNING`` in the same statement.
         :param kwargs: Filters for the instances to delete.
-        :return: None
+        :return: The number of deleted instances, or the deleted instances.
         """
         self.query = self.build_handler(
             joins=joins, **kwargs
         )
         self.query = await self._pre_delete(db_session, self.query, **kwargs)
-        delete_stmt = sqla_delete(self.cls).where(self.query.whereclause)
+        delete_stmt = sqla_delete(self.cls).where(self._bound_whereclause())
+        if returning:
+            delete_stmt = delete_stmt.returning(self.cls)
         result = await db_session.execute(delete_stmt)
-        await db_session.commit()
-        return result.rowcount
+        deleted = result.scalars().all() if returning else result.rowcount
+        await self._save(db_session, self._autocommit(commit))
+        return deleted
 
     async def update(
         self,
@@ -138,29 +248,50 @@ class QueryMixin(BaseQuery, SignalMixin):
         data: dict,
         joins: set = None,
         limit: int = None,
+        commit: Optional[bool] = None,
+        returning: bool = False,
         **kwargs
-    ) -> int:
+    ) -> Union[int, list, Type[Any], Type["QueryMixin"]]:
         """
         Update instances matching the given filters with the given data.
 
+        The updated instances are loaded by ``UPDATE ... RETURNING`` in the
+        same statement, so they are never selected again.
+
         :param db_session: The async database session.
         :param update_data: A dictionary containing the data to update.
+        :param limit: With 1, return the updated instance when exactly one
+            was updated.
+        :param commit: Commit the update, see `_autocommit`.
+        :param returning: Return the updated instances.
         :param kwargs: Filters for the instances to update.
-        :return: None
+        :return: The number of updated instances, the updated instances or
+            the single updated instance.
         """
         self.query = self.build_handler(
             joins=joins, limit=limit, **kwargs
         )
         self.query = await self._pre_update(db_session, self.query, **kwargs)
         self.query = sqla_update(self.cls).where(
-            self.query.whereclause
+            self._bound_whereclause()
         ).values(data)
-        result = await db_session.execute(self.query)
-        await db_session.commit()
-        if result.rowcount == 1 and limit == 1:
-            updated_instance = await self.get(db_session, **kwargs)
-            return updated_instance
-        return result.rowcount
+        if not (returning or limit == 1):
+            result = await db_session.execute(self.query)
+            await self._save(db_session, self._autocommit(commit))
+            return result.rowcount
+
+        result = await db_session.execute(
+            self.query.returning(self.cls),
+            execution_options={"populate_existing": True},
+        )
+        instances = result.scalars().all()
+        await self._save(db_session, self._autocommit(commit))
+        if returning:
+            return instances
+        if len(instances) == 1:
+            self.instance = instances[0]
+            return self.instance
+        return len(instances)
 
     async def aggregate(
         self,
@@ -198,53 +329,38 @@ class QueryMixin(BaseQuery, SignalMixin):
         self.query = self.query.select_from(self.cls).with_only_columns(
             aggregation
         )
-        result = await db_session.execute(self.query)
+        result = await db_session.execute(self.query, self.params)
         return result.scalar()
 
-    async def exclude(
-        self,
-        db_session: AsyncSession,
-        joins: set = None,
-        order_by=None,
-        skip: int = None,
-        limit=None,
-        **kwargs
-    ) -> Union[Type[Any], Type["QueryMixin"]]:
+    def exclude(self, **kwargs) -> Union[Type[Any], Type["QueryMixin"]]:
         """
-        Retrieve instances that do not match the given filters.
+        Exclude the instances matching the given filters.
 
-        :param db_session: The async database session.
-        :param joins: A set of join conditions.
-        :param order_by: A string or tuple of strings indicating the columns
-            to order by.
-        :param skip: The number of instances to skip.
-        :param get_count: If True, also return the count of instances.
-        :param kwargs: Additional filters for the query.
-        :return: A list of instances or a tuple containing the list of
-            instances and the count.
+        The lookups are compiled like ``filter()`` lookups and wrapped in
+        ``(...) IS NOT true``, so rows where they evaluate to NULL are kept.
+        Can be chained before or after ``filter()`` and applies to the
+        subsequent ``execute``, ``count``, ``stream``, ``get``, ``update``
+        and ``delete`` calls.
+
+        :param kwargs: Filters for the instances to exclude.
+        :return: The query.
         """
-        all_stmt = self.build_handler(
-            db_session=db_session, joins=joins, order_by=order_by, skip=skip,
-            limit=limit
-        )
-        all_result = await db_session.execute(all_stmt)
-        all_instances = all_result.scalars().all()
-        exclude_stmt = self.build_handler(
-            db_session=db_session, joins=joins, order_by=order_by, skip=skip,
-            **kwargs
-        )
-        exclude_result = await db_session.execute(exclude_stmt)
-        exclude_instances = exclude_result.scalars().all()
-        self.instance = list(set(all_instances) - set(exclude_instances))
-        return self.instance
+        self._excludes.update(kwargs)
+        if self._filter_args is not None:
+            self.filter(**self._filter_args)
+        return self
 
     async def add_m2m(
-            self, db_session: AsyncSession, other_models: list
+            self,
+            db_session: AsyncSession,
+            other_models: list,
+            commit: Optional[bool] = None,
     ) -> None:
         """
         Add a many-to-many relationship between two entities.d
         :param db_session: The async database session.
         :param other_models: The entity in the relationship as list.
+        :param commit: Commit the relationship, see `_autocommit`.
         :return: None
         """
         if self.instance is None:
@@ -261,119 +377,618 @@ class QueryMixin(BaseQuery, SignalMixin):
                 ) and value.argument == self.instance.__class__.__name__:
                     getattr(other_model, attr).append(self.instance)
 
-        await db_session.commit()
+        await self._save(db_session, self._autocommit(commit))
 
     async def get_or_create(
-        self, db_session: AsyncSession, create_data: dict, **kwargs
+        self,
+        db_session: AsyncSession,
+        create_data: dict,
+        atomic: bool = False,
+        conflict_fields: List[str] = None,
+        commit: Optional[bool] = None,
+        **kwargs
     ) -> Tuple[Union[Type[Any], Type["QueryMixin"]], bool]:
         """
         Retrieve an instance if it exists, otherwise create a new one.
 
+        With ``atomic`` the instance is created by
+        ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` in one statement, so
+        concurrent calls can't create duplicates; the existing row is only
+        selected when the insert hit a conflict. The filters must then be
+        equality lookups covered by a unique index.
+
         :param db_session: The async database session.
         :param create_data: A dict containing the data for the new instance.
+        :param atomic: Create the instance with a single upsert statement.
+        :param conflict_fields: The unique fields of the conflict target,
+            the filter fields by default.
+        :param commit: Commit a created instance, see `_autocommit`.
         :param kwargs: Filters for the query.
         :return: A tuple containing the instance and a boolean indicating
             if the instance was created.
         """
+        if atomic:
+            filters = self._equality_filters(kwargs, "Atomic get_or_create")
+            insert_stmt = pg_insert(self.cls).values(
+                **{**filters, **create_data}
+            ).on_conflict_do_nothing(
+                index_elements=conflict_fields or list(filters)
+            ).returning(self.cls)
+            result = await db_session.execute(insert_stmt)
+            instance = result.scalars().first()
+            if instance is not None:
+                await self._save(db_session, self._autocommit(commit))
+                self.instance = instance
+                return instance, True
+            return await self.get(db_session, **kwargs), False
+
         instance = await self.get(db_session, **kwargs)
         created = False
         if not instance:
-            instance = await self.create(db_session, **create_data)
+            instance = await self.create(
+                db_session, commit=commit, **create_data
+            )
             created = True
         return instance, created
 
+    async def upsert(
+        self,
+        db_session: AsyncSession,
+        data: dict,
+        conflict_fields: List[str],
+        update_fields: List[str] = None,
+        commit: Optional[bool] = None,
+    ) -> Union[Type[Any], Type["QueryMixin"]]:
+        """
+        Insert an instance, or update the conflicting one, in one statement.
+
+        :param db_session: The async database session.
+        :param data: A dict containing the data for the instance.
+        :param conflict_fields: The unique fields of the conflict target.
+        :param update_fields: The fields to update on conflict, all other
+            fields of ``data`` by default.
+        :param commit: Commit the instance, see `_autocommit`.
+        :return: The inserted or updated instance.
+        """
+        update_fields = update_fields or [
+            field for field in data if field not in conflict_fields
+        ] or conflict_fields[:1]
+        insert_stmt = self._on_conflict(
+            pg_insert(self.cls).values(**data), "update",
+            conflict_fields, update_fields, list(data)
+        ).returning(self.cls)
+        result = await db_session.execute(
+            insert_stmt, execution_options={"populate_existing": True}
+        )
+        self.instance = result.scalars().one()
+        await self._save(db_session, self._autocommit(commit))
+        return self.instance
+
+    async def bulk_get_or_create(
+        self,
+        db_session: AsyncSession,
+        instances_data: List[dict],
+        conflict_fields: List[str],
+        chunk_size: int = 1000,
+        commit: Optional[bool] = None,
+    ) -> List[Tuple[Union[Type[Any], Type["QueryMixin"]], bool]]:
+        """
+        Retrieve or create many instances identified by unique fields.
+
+        Each chunk is inserted with one ``ON CONFLICT DO NOTHING RETURNING``
+        statement and the rows that already existed are selected with one
+        more query.
+
+        :param db_session: The async database session.
+        :param instances_data: A list of dictionaries containing the data for
+            the instances, each including the conflict fields.
+        :param conflict_fields: The unique fields identifying an instance.
+        :param chunk_size: The number of rows per statement.
+        :param commit: Commit the created instances, see `_autocommit`.
+        :return: A list of (instance, created) tuples in the input order.
+        """
+        def identity(item):
+            if isinstance(item, dict):
+                return tuple(item[field] for field in conflict_fields)
+            return tuple(getattr(item, field) for field in conflict_fields)
+
+        commit = self._autocommit(commit)
+        found = {}
+        created = set()
+        try:
+            for start in range(0, len(instances_data), chunk_size):
+                chunk = instances_data[start:start + chunk_size]
+                insert_stmt = pg_insert(self.cls).values(
+                    chunk
+                ).on_conflict_do_nothing(
+                    index_elements=conflict_fields
+                ).returning(self.cls)
+                result = await db_session.execute(insert_stmt)
+                for instance in result.scalars().all():
+                    found[identity(instance)] = instance
+                    created.add(identity(instance))
+
+                missing = {
+                    identity(data) for data in chunk
+                } - set(found)
+                if missing:
+                    columns = [
+                        getattr(self.cls, field) for field in conflict_fields
+                    ]
+                    result = await db_session.execute(
+                        select(self.cls).where(
+                            tuple_(*columns).in_(list(missing))
+                        )
+                    )
+                    for instance in result.scalars().all():
+                        found[identity(instance)] = instance
+            await self._save(db_session, commit)
+        except Exception as error:
+            if commit:
+                await db_session.rollback()
+            raise error
+
+        response = []
+        for data in instances_data:
+            key = identity(data)
+            response.append((found.get(key), key in created))
+            created.discard(key)
+        return response
+
     async def bulk_create(
-            self, db_session: AsyncSession, instances_data: List[dict]
-    ) -> list:
+            self,
+            db_session: AsyncSession,
+            instances_data: List[dict],
+            method: str = "orm",
+            chunk_size: int = 1000,
+            on_conflict: str = None,
+            conflict_fields: List[str] = None,
+            update_fields: List[str] = None,
+            commit: Optional[bool] = None,
+    ) -> Union[int, list]:
         """
         Create multiple instances in a single bulk operation.
+
+        - ``orm`` adds ORM instances to the session and flushes them.
+        - ``insert`` sends multi-row ``INSERT ... VALUES ... RETURNING`` in
+          chunks of ``chunk_size`` rows without building ORM instances.
+        - ``copy`` streams the rows through asyncpg's COPY protocol. Rows
+          needing SQL-side defaults or conflict handling are copied into a
+          temporary table first and moved with ``INSERT ... SELECT``.
+
         :param db_session: The async database session.
         :param instances_data: A list of dictionaries containing the data for
-            the new instances.
-        :return: A list of created instances.
+            the new instances. Columns left out of some rows get their Python
+            default there, see `_uniform_rows`.
+        :param method: Either ``orm``, ``insert`` or ``copy``.
+        :param chunk_size: The number of rows per ``insert`` statement.
+        :param on_conflict: ``nothing`` or ``update`` to emit
+            ``ON CONFLICT DO NOTHING/UPDATE`` (``insert`` and ``copy`` only).
+        :param conflict_fields: The unique fields of the conflict target.
+        :param update_fields: The fields to update on conflict, all inserted
+            fields except the conflict target by default.
+        :param commit: Commit the created instances, see `_autocommit`.
+        :return: The number of created instances, or for ``insert`` the list
+            of their primary keys.
         """
-        instances = [self.cls(**data) for data in instances_data]
-
+        if method not in ("orm", "insert", "copy"):
+            raise ValueError(f"Unsupported bulk create method '{method}'")
+        if method == "orm" and on_conflict:
+            raise ValueError("on_conflict requires the insert or copy method")
+        if not instances_data:
+            return [] if method == "insert" else 0
+
+        commit = self._autocommit(commit)
         try:
-            db_session.add_all(instances)
-            await db_session.flush()
-            await db_session.commit()
+            if method == "insert":
+                created = await self._bulk_insert(
+                    db_session, instances_data, chunk_size,
+                    on_conflict, conflict_fields, update_fields
+                )
+            elif method == "copy":
+                created = await self._bulk_copy(
+                    db_session, instances_data,
+                    on_conflict, conflict_fields, update_fields
+                )
+            else:
+                instances = [self.cls(**data) for data in instances_data]
+                db_session.add_all(instances)
+                created = len(instances)
+            await self._save(db_session, commit)
         except Exception as error:
-            await db_session.rollback()
+            if commit:
+                await db_session.rollback()
             raise error
-        return len(instances)
+        return created
+
+    @staticmethod
+    def _autocommit(commit: Optional[bool]) -> bool:
+        """
+        Whether a write commits the session.
+
+        By default writes commit when ``ORM_AUTOCOMMIT`` is enabled and they
+        don't run inside a `Transactional` boundary, which owns the commit
+        of its unit of work; otherwise they only flush. With
+        ``ORM_AUTOCOMMIT`` disabled, writes flushed outside a boundary are
+        committed at the end of the request or standalone session.
+        """
+        if commit is None:
+            return config.ORM_AUTOCOMMIT and not in_transaction()
+        return commit
+
+    @staticmethod
+    async def _save(db_session: AsyncSession, commit: bool) -> None:
+        if commit:
+            await db_session.commit()
+            return
 
-    async def select_related(self, session, *related_models):
-        raise NotImplementedError("Not Implemented Yet")
+        await db_session.flush()
+        if not in_transaction():
+            db_session.info[PENDING_COMMIT] = True
 
-    def prefetch_related(self, related_model: 'QueryMixin') -> 'QueryMixin':
-        model_fields = [
-            f for f in related_model.__dict__.keys() if not f.startswith("_")
+    def _column_rows(self, instances_data: List[dict]) -> List[dict]:
+        """
+        Map attribute names of the rows to table column names.
+        """
+        names = {}
+        for data in instances_data:
+            for key in data:
+                if key not in names:
+                    attr = getattr(self.cls, key, None)
+                    if attr is None or not hasattr(attr.property, "columns"):
+                        raise ValueError(
+                            f"No Column '{key}' in class '{self.cls.__name__}'"
+                        )
+                    names[key] = attr.property.columns[0].name
+        rows = [
+            {names[key]: value for key, value in data.items()}
+            for data in instances_data
         ]
-        relation_ship_field = next(
-            (
-                field for field in model_fields if
-                self.is_m2m_relationship(
-                    related_model, field
-                ) and getattr(
-                    related_model, field
-                ).property.argument == self.cls.__name__
-            ), None
-        )
-        if relation_ship_field:
-            self._prefetch_related_joins.append(
-                (
-                    related_model,
-                    getattr(
-                        related_model, relation_ship_field
-                    ).property.secondary
+        return self._uniform_rows(rows)
+
+    def _uniform_rows(self, rows: List[dict]) -> List[dict]:
+        """
+        Give every row the columns provided by any of them.
+
+        A column left out of some rows gets its Python default there, or
+        None without a default. The rows are sent in one statement, so a
+        column with an SQL-side default must be left out of all rows or
+        none.
+        """
+        table = self.cls.__table__
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        missing = [
+            name for name in names if any(name not in row for row in rows)
+        ]
+        if not missing:
+            return rows
+
+        for name in missing:
+            column = table.c[name]
+            if column.server_default is not None or not (
+                column.default is None
+                or column.default.is_scalar
+                or column.default.is_callable
+            ):
+                raise ValueError(
+                    f"Column '{name}' of class '{self.cls.__name__}' has an "
+                    f"SQL default and is missing from some of the rows"
                 )
+        return [
+            {
+                name: row[name] if name in row
+                else self._python_default(table.c[name])
+                for name in names
+            }
+            for row in rows
+        ]
+
+    def _on_conflict(
+        self,
+        insert_stmt,
+        on_conflict: str,
+        conflict_fields: List[str],
+        update_fields: List[str],
+        inserted_fields,
+    ):
+        """
+        Apply ``ON CONFLICT`` handling to a Postgres INSERT statement.
+        """
+        if on_conflict is None:
+            return insert_stmt
+        if on_conflict == "nothing":
+            return insert_stmt.on_conflict_do_nothing(
+                index_elements=conflict_fields
             )
-        else:
-            rel_name = related_model.__name__
-            this_name = self.cls.__name__
-            raise ValueError(
-                f"No relationship between model {this_name} and {rel_name}"
+        if on_conflict == "update":
+            if not conflict_fields:
+                raise ValueError("on_conflict='update' needs conflict_fields")
+            update_fields = update_fields or [
+                field for field in inserted_fields
+                if field not in conflict_fields
+            ]
+            set_ = {
+                field: insert_stmt.excluded[field] for field in update_fields
+            }
+            for column in self.cls.__table__.columns:
+                onupdate = column.onupdate
+                if onupdate is not None and column.name not in set_ and (
+                    onupdate.is_clause_element or onupdate.is_scalar
+                ):
+                    set_[column.name] = onupdate.arg
+            return insert_stmt.on_conflict_do_update(
+                index_elements=conflict_fields, set_=set_
             )
-        return self
+        raise ValueError(f"Unsupported on_conflict value '{on_conflict}'")
+
+    async def _bulk_insert(
+        self,
+        db_session: AsyncSession,
+        instances_data: List[dict],
+        chunk_size: int,
+        on_conflict: str,
+        conflict_fields: List[str],
+        update_fields: List[str],
+    ) -> list:
+        table = self.cls.__table__
+        rows = self._column_rows(instances_data)
+        insert_stmt = self._on_conflict(
+            pg_insert(table), on_conflict, conflict_fields, update_fields,
+            list(rows[0])
+        ).returning(*table.primary_key.columns)
+
+        primary_keys = []
+        for start in range(0, len(rows), chunk_size):
+            result = await db_session.execute(
+                insert_stmt, rows[start:start + chunk_size]
+            )
+            primary_keys.extend(result.scalars().all())
+        return primary_keys
+
+    async def _bulk_copy(
+        self,
+        db_session: AsyncSession,
+        instances_data: List[dict],
+        on_conflict: str,
+        conflict_fields: List[str],
+        update_fields: List[str],
+    ) -> int:
+        table = self.cls.__table__
+        rows = self._column_rows(instances_data)
+        provided = list(dict.fromkeys(name for row in rows for name in row))
+        columns = list(provided)
+
+        staged = on_conflict is not None
+        for column in table.columns:
+            if column.name in columns or column.default is None:
+                continue
+            if column.default.is_scalar or column.default.is_callable:
+                columns.append(column.name)
+            else:
+                staged = True
+
+        def records():
+            for row in rows:
+                yield tuple(
+                    row[name] if name in row
+                    else self._python_default(table.c[name])
+                    for name in columns
+                )
+
+        connection = await db_session.connection(
+            bind_arguments={"clause": pg_insert(table)}
+        )
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        if not staged:
+            status = await driver_connection.copy_records_to_table(
+                table.name,
+                records=records(),
+                columns=columns,
+                schema_name=table.schema,
+            )
+            return int(status.split()[-1])
+
+        preparer = connection.dialect.identifier_preparer
+        staging_name = f"bulk_{table.name}_{uuid4().hex[:12]}"
+        await connection.exec_driver_sql(
+            f"CREATE TEMP TABLE {preparer.quote(staging_name)} "
+            f"ON COMMIT DROP AS SELECT "
+            f"{', '.join(preparer.quote(name) for name in columns)} "
+            f"FROM {preparer.format_table(table)} WITH NO DATA"
+        )
+        await driver_connection.copy_records_to_table(
+            staging_name, records=records(), columns=columns
+        )
+        staging = sqla_table(
+            staging_name, *[sqla_column(name) for name in columns]
+        )
+        insert_stmt = self._on_conflict(
+            pg_insert(table).from_select(
+                columns, select(*[staging.c[name] for name in columns])
+            ),
+            on_conflict, conflict_fields, update_fields, provided
+        )
+        result = await connection.execute(insert_stmt)
+        await connection.exec_driver_sql(
+            f"DROP TABLE {preparer.quote(staging_name)}"
+        )
+        return result.rowcount
+
+    @staticmethod
+    def _python_default(column):
+        if column.default is None:
+            return None
+        if column.default.is_callable:
+            return column.default.arg(None)
+        return column.default.arg
+
+    def select_related(self, *relations) -> "QueryMixin":
+        """
+        Load the given relationships in the same query with a JOIN.
+
+        Can be chained before or after ``filter()``; nested relationships
+        are separated by ``__``, e.g. ``select_related("owner__company")``.
+
+        :param relations: Relationship names or related models.
+        :return: The query.
+        """
+        return self._add_loader_options(joinedload, relations)
+
+    def prefetch_related(self, *relations) -> "QueryMixin":
+        """
+        Load the given relationships with one ``SELECT ... IN`` query each.
+
+        Suited for collections and many-to-many relationships, as the rows
+        of the main query are not multiplied.
+
+        :param relations: Relationship names or related models.
+        :return: The query.
+        """
+        return self._add_loader_options(selectinload, relations)
 
     async def bulk_update(
         self,
-        db_sesssion: AsyncSession,
-        update_data: List[Tuple[dict, dict]]
+        db_session: AsyncSession,
+        update_data: List[Tuple[dict, dict]],
+        method: str = "values",
+        chunk_size: int = 1000,
+        commit: Optional[bool] = None,
+    ) -> int:
+        """
+        Perform a bulk update of instances based on given filters and update.
+
+        Rows are grouped by their filter fields and updated columns, and each
+        group is sent in chunks of ``chunk_size`` rows:
+
+        - ``values`` emits one ``UPDATE ... FROM (VALUES ...)`` statement per
+          chunk; filters may be equality lookups on any columns.
+        - ``orm`` runs an ORM bulk UPDATE by primary key (executemany);
+          filters must consist of the primary key only.
+
+        Keep ``chunk_size`` times the number of columns below the 32767 bind
+        parameter limit of Postgres. Instances already loaded in the session
+        are not refreshed.
+
+        :param db_session: The async database session.
+        :param update_data: A list of tuples, where each tuple contains a
+            dictionary of filters and a dictionary of update data.
+        :param method: Either ``values`` or ``orm``.
+        :param chunk_size: The number of rows sent per statement.
+        :param commit: Commit the updates, see `_autocommit`.
+        :return: The number of updated instances. The ``orm`` method can't
+            read rowcounts of an executemany and counts the submitted rows.
+        """
+        if method not in ("values", "orm"):
+            raise ValueError(f"Unsupported bulk update method '{method}'")
+
+        groups = {}
+        for filters, data in update_data:
+            filters = self._equality_filters(filters, "Bulk update")
+            group_key = (tuple(sorted(filters)), tuple(sorted(data)))
+            groups.setdefault(group_key, []).append((filters, data))
+
+        commit = self._autocommit(commit)
+        num_updated = 0
+        try:
+            for (filter_fields, data_fields), rows in groups.items():
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    if method == "orm":
+                        num_updated += await self._bulk_update_by_pk(
+                            db_session, filter_fields, chunk
+                        )
+                    else:
+                        num_updated += await self._bulk_update_from_values(
+                            db_session, filter_fields, data_fields, chunk
+                        )
+            await self._save(db_session, commit)
+        except Exception as error:
+            if commit:
+                await db_session.rollback()
+            raise error
+        return num_updated
+
+    def _equality_filters(self, filters: dict, operation: str) -> dict:
+        """
+        Normalize equality filters to plain field names.
+
+        :param filters: The filters to normalize.
+        :param operation: The operation named in the error for other lookups.
+        """
+        normalized = {}
+        for key, value in filters.items():
+            field = key[:-len("__exact")] if key.endswith("__exact") else key
+            if "__" in field or not hasattr(self.cls, field):
+                raise ValueError(
+                    f"{operation} supports equality filters on columns of "
+                    f"'{self.cls.__name__}' only, got '{key}'"
+                )
+            normalized[field] = value
+        return normalized
+
+    async def _bulk_update_by_pk(
+        self,
+        db_session: AsyncSession,
+        filter_fields: tuple,
+        chunk: list,
+    ) -> int:
+        pk_fields = {
+            self.cls.__mapper__.get_property_by_column(column).key
+            for column in self.cls.__mapper__.primary_key
+        }
+        if set(filter_fields) != pk_fields:
+            raise ValueError(
+                "ORM bulk update requires the filters to be the primary key"
+            )
+        result = await db_session.execute(
+            sqla_update(self.cls),
+            [{**filters, **data} for filters, data in chunk],
+        )
+        return result.rowcount if result.rowcount >= 0 else len(chunk)
+
+    async def _bulk_update_from_values(
+        self,
+        db_session: AsyncSession,
+        filter_fields: tuple,
+        data_fields: tuple,
+        chunk: list,
     ) -> int:
-        raise NotImplementedError("""
-        sqlalchemy.exc.InvalidRequestError
-        WHERE clause with bulk ORM UPDATE not supported right now
-        """)
-        # """
-        # Perform a bulk update of instances based on given filters and update.
-        # :param db_session: The async database session.
-        # :param update_data: A list of tuples, where each tuple contains a
-        #     dictionary of filters and a dictionary of update data.
-        # :return: The number of updated instances.
-        # """
-        # num_updated = 0
-        # update_params = []
-        # for idx, (filter_conditions, data) in enumerate(update_data):
-        #     update_params.append(
-        #         {
-        #             **filter_conditions,
-        #             **{f"{key}_{idx}": value for key, value in data.items()}
-        #         }
-        #     )
-        # update_stmt = sqla_update(self.cls)
-        # for idx, (filter_conditions, data) in enumerate(update_data):
-        #     condition_query = self.build_handler(
-        #         db_session, **filter_conditions
-        #     )
-        #     update_stmt = update_stmt.where(condition_query)
-        #     for key in data.keys():
-        #         update_stmt = update_stmt.values(
-        #             {getattr(self.cls, key): bindparam(f"{key}_{idx}")}
-        #         )
-
-        # result = await db_session.execute(update_stmt, update_params)
-        # await db_session.commit()
-        # num_updated = result.rowcount
-        # return num_updated
+        table = self.cls.__table__
+        filter_columns = [
+            getattr(self.cls, field).property.columns[0]
+            for field in filter_fields
+        ]
+        data_columns = [
+            getattr(self.cls, field).property.columns[0]
+            for field in data_fields
+        ]
+        rows = sqla_values(
+            *[
+                sqla_column(f"f_{column.name}", column.type)
+                for column in filter_columns
+            ],
+            *[
+                sqla_column(f"v_{column.name}", column.type)
+                for column in data_columns
+            ],
+            name="bulk_rows",
+        ).data([
+            (
+                *[filters[field] for field in filter_fields],
+                *[data[field] for field in data_fields],
+            )
+            for filters, data in chunk
+        ])
+        update_stmt = sqla_update(table).where(
+            *[
+                table.c[column.name] == rows.c[f"f_{column.name}"]
+                for column in filter_columns
+            ]
+        ).values({
+            column.name: rows.c[f"v_{column.name}"]
+            for column in data_columns
+        })
+        result = await db_session.execute(update_stmt)
+        return result.rowcount
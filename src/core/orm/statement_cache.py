@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class StatementCache:
+    """
+    Bounded LRU cache of prebuilt statements keyed on the filter shape.
+
+    Entries hold statements with ``bindparam`` placeholders instead of the
+    filter values, so a single entry serves every call with the same lookups.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: Hashable, entry: Any) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.uncacheable = 0
+
+    def info(self) -> dict:
+        """
+        Returns the cache counters.
+
+        :return: A dictionary with hits, misses, uncacheable builds and size.
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            uncacheable=self.uncacheable,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+        )
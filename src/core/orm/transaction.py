@@ -0,0 +1,13 @@
+from contextvars import ContextVar
+
+# Set in `Session.info` by writes that were flushed but not committed.
+PENDING_COMMIT = "pending_commit"
+
+transaction_depth: ContextVar[int] = ContextVar("transaction_depth", default=0)
+
+
+def in_transaction() -> bool:
+    """
+    Whether the caller runs inside a `Transactional` boundary.
+    """
+    return transaction_depth.get() > 0
@@ -1,16 +1,27 @@
+from enum import Enum
 from typing import Any, Generic, Type, TypeVar, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import Base
+from core.database.identity_map import get_by_identity
 from core.orm.models import AbstractModel
 
 ModelType = TypeVar("ModelType", bound=Union[AbstractModel, Base])
 
 
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    WINDOW = "window"
+    ESTIMATE = "estimate"
+
+
 class BaseRepository(Generic[ModelType]):
     """Base class for data repositories."""
 
+    # Injected dependency, left out of cache keys by `CustomKeyMaker`.
+    __skip_cache_key__ = True
+
     def __init__(self, model: Type[ModelType], db_session: AsyncSession):
         self.session = db_session
         self.model_class: Type[ModelType] = model
@@ -20,6 +31,9 @@ class BaseRepository(Generic[ModelType]):
         order_by: str = None,
         limit: int = None,
         skip: int = None,
+        cursor: str = None,
+        keyset: bool = False,
+        count_strategy: CountStrategy = CountStrategy.EXACT,
         **kwargs
     ):
         """
@@ -28,25 +42,52 @@ class BaseRepository(Generic[ModelType]):
         :param order_by: Order by attribute to sort results
         :param limit: Limit and slice the results from db
         :param skip: Skip index results from db
+        :param cursor: Cursor of the page to return in keyset mode
+        :param keyset: Paginate by cursor instead of skip
+        :param count_strategy: How to count the results: a separate count
+            query, ``count(*) OVER ()`` in the same statement or a planner
+            estimate. The window only sees the rows after the cursor, so
+            pages after the first in keyset mode are counted separately.
 
-        :return: The created model instance.
+        :return: The results, their count and, in keyset mode, the cursor
+            of the next page.
         """
-        results = self._order_by(
-                order_by=order_by,
-                limit=limit,
-                skip=skip,
-                **kwargs
-        )
-        count = self._count(
+        keyset = keyset or cursor is not None
+        query = self.model_class.objects.filter(
             order_by=order_by,
             limit=limit,
             skip=skip,
+            keyset=keyset,
+            cursor=cursor,
             **kwargs
         )
-        return dict(
-            results=await results,
-            count=await count
+        if count_strategy == CountStrategy.WINDOW and cursor is None:
+            results, count = await query.execute_with_count(
+                db_session=self.session
+            )
+        elif count_strategy == CountStrategy.ESTIMATE:
+            results = await query.execute(db_session=self.session)
+            count = await self.model_class.objects.filter(
+                order_by=order_by,
+                **kwargs
+            ).estimated_count(
+                db_session=self.session
+            )
+        else:
+            results = await query.execute(db_session=self.session)
+            count = await self._count(
+                order_by=order_by,
+                limit=limit,
+                skip=skip,
+                **kwargs
+            )
+        response = dict(
+            results=results,
+            count=count
         )
+        if keyset:
+            response["next_cursor"] = query.next_cursor(response["results"])
+        return response
 
     async def create(self, **kwargs) -> ModelType:
         """
@@ -88,23 +129,38 @@ class BaseRepository(Generic[ModelType]):
         self,
         skip: int = 0,
         limit: int = 100,
+        cursor: str = None,
+        keyset: bool = False,
         **kwargs: dict
-    ) -> list[ModelType]:
+    ) -> list[ModelType] | dict:
         """
         Returns a list of model instances.
 
         :param skip: The number of records to skip.
         :param limit: The number of record to return.
+        :param cursor: Cursor of the page to return in keyset mode.
+        :param keyset: Paginate by cursor instead of skip.
         :param join_: The joins to make.
-        :return: A list of model instances.
+        :return: A list of model instances, or in keyset mode a dictionary
+            with the results and the cursor of the next page.
         """
-        return await self.model_class.objects.filter(
+        keyset = keyset or cursor is not None
+        query = self.model_class.objects.filter(
             limit=limit,
             skip=skip,
+            keyset=keyset,
+            cursor=cursor,
             **kwargs
-        ).execute(
+        )
+        results = await query.execute(
             db_session=self.session
         )
+        if not keyset:
+            return results
+        return dict(
+            results=results,
+            next_cursor=query.next_cursor(results)
+        )
 
     async def get_by(
         self,
@@ -141,11 +197,19 @@ class BaseRepository(Generic[ModelType]):
         """
         Returns the model instance matching the field and value.
 
+        Lookups by primary key only are served from the session identity
+        map when the instance was already loaded in the current request.
+
         :param field: The field to match.
         :param value: The value to match.
         :param join_: The joins to make.
         :return: The model instance.
         """
+        identity = self._primary_key_lookup(kwargs)
+        if identity is not None:
+            return await get_by_identity(
+                self.session, self.model_class, identity
+            )
         return await self.model_class.objects.get(
             db_session=self.session,
             limit=limit,
@@ -153,6 +217,24 @@ class BaseRepository(Generic[ModelType]):
             **kwargs
         )
 
+    def _primary_key_lookup(self, lookups: dict) -> Any:
+        """
+        Returns the primary key value if the lookups are a primary key match.
+
+        :param lookups: The lookups of the query.
+        :return: The primary key value, or None.
+        """
+        primary_key = self.model_class.__mapper__.primary_key
+        if len(lookups) != 1 or len(primary_key) != 1:
+            return None
+        pk_name = self.model_class.__mapper__.get_property_by_column(
+            primary_key[0]
+        ).key
+        key, value = next(iter(lookups.items()))
+        if key not in (pk_name, f"{pk_name}__exact"):
+            return None
+        return value
+
     async def delete(self, **kwargs: dict) -> None:
         """
         Deletes the model.
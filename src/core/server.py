@@ -1,3 +1,5 @@
+import logging
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import Depends, FastAPI, Request
@@ -6,8 +8,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from api import router
-from core.cache import Cache, CustomKeyMaker, RedisBackend
+from core.cache import (
+    Cache,
+    CustomKeyMaker,
+    InMemoryBackend,
+    RedisBackend,
+    TieredBackend,
+)
 from core.config import config
+from core.database import replicas, standalone_session
 from core.exceptions import CustomException, PostgresError
 from core.fastapi.dependencies import Logging
 from core.fastapi.middlewares import (
@@ -17,6 +26,8 @@ from core.fastapi.middlewares import (
     SQLAlchemyMiddleware,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def on_auth_error(request: Request, exc: Exception):
     status_code, error_code, message = 401, None, str(exc)
@@ -68,14 +79,48 @@ def make_middleware() -> List[Middleware]:
             backend=AuthBackend(),
             on_error=on_auth_error,
         ),
-        Middleware(SQLAlchemyMiddleware),
+        Middleware(
+            SQLAlchemyMiddleware,
+            exclude_paths=("/docs", "/redoc", "/openapi.json"),
+        ),
         Middleware(ResponseLoggerMiddleware),
     ]
     return middleware
 
 
 def init_cache() -> None:
-    Cache.init(backend=RedisBackend(), key_maker=CustomKeyMaker())
+    backends = {
+        "redis": RedisBackend,
+        "tiered": TieredBackend,
+        "memory": InMemoryBackend,
+    }
+    Cache.init(
+        backend=backends[config.CACHE_BACKEND](),
+        key_maker=CustomKeyMaker(),
+        task_scope=standalone_session,
+    )
+
+
+async def connect_cache() -> None:
+    """
+    Check the cache backend at startup. An unavailable backend only logs a
+    warning, unless ``CACHE_STRICT_CONNECT`` makes it fail the startup.
+    """
+    try:
+        await Cache.backend.connect()
+    except Exception as exception:
+        if config.CACHE_STRICT_CONNECT:
+            raise exception
+        logger.warning("Cache backend is unavailable: %s", exception)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await connect_cache()
+    replicas.start()
+    yield
+    await replicas.stop()
+    await Cache.backend.close()
 
 
 def create_app() -> FastAPI:
@@ -87,6 +132,7 @@ def create_app() -> FastAPI:
         redoc_url=None if config.ENVIRONMENT == "production" else "/redoc",
         dependencies=[Depends(Logging)],
         middleware=make_middleware(),
+        lifespan=lifespan,
     )
     init_routers(app_=app_)
     init_listeners(app_=app_)
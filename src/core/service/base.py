@@ -14,6 +14,9 @@ ModelType = TypeVar("ModelType", bound=Union[Base, AbstractModel])
 class BaseService(Generic[ModelType]):
     """Base class for data services."""
 
+    # Injected dependency, left out of cache keys by `CustomKeyMaker`.
+    __skip_cache_key__ = True
+
     def __init__(self, model: Type[ModelType], repository: BaseRepository):
         self.model_class = model
         self.repository = repository
@@ -32,7 +35,7 @@ class BaseService(Generic[ModelType]):
         )
         if not db_obj:
             raise NotFoundException(
-                f"{self.model_class.__tablename__.title()} with id: {id} does not exist"
+                f"{self.model_class.__tablename__.title()} with id: {id_} does not exist"
             )
         return db_obj
 
@@ -55,18 +58,28 @@ class BaseService(Generic[ModelType]):
         return db_obj
 
     async def get_all(
-        self, skip: int = 0, limit: int = 100, **kwargs: dict
-    ) -> list[ModelType]:
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str = None,
+        keyset: bool = False,
+        **kwargs: dict
+    ) -> list[ModelType] | dict:
         """
         Returns a list of records based on pagination params.
 
         :param skip: The number of records to skip.
         :param limit: The number of records to return.
+        :param cursor: Cursor of the page to return in keyset mode.
+        :param keyset: Paginate by cursor instead of skip.
         :param join_: The joins to make.
-        :return: A list of records.
+        :return: A list of records, or in keyset mode a dictionary with the
+            records and the cursor of the next page.
         """
 
-        response = await self.repository.get_all(skip, limit, **kwargs)
+        response = await self.repository.get_all(
+            skip, limit, cursor=cursor, keyset=keyset, **kwargs
+        )
         return response
 
     async def create(self, **kwargs: dict) -> ModelType:
@@ -0,0 +1,23 @@
+import pytest
+from httpx import AsyncClient
+
+from core.config import config
+
+
+@pytest.mark.asyncio
+async def test_metrics(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_ENABLED", True)
+    response = await client.get(
+        "v1/monitoring/metrics/",
+    )
+    assert response.status_code == 200
+    assert "writer" in response.json()["database"]
+    assert set(response.json()["identity_map"]) == {"hits", "misses"}
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_disabled_by_default(client: AsyncClient):
+    response = await client.get(
+        "v1/monitoring/metrics/",
+    )
+    assert response.status_code == 404
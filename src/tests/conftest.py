@@ -1,6 +1,7 @@
 import asyncio
 import os
-from typing import Generator
+from contextlib import asynccontextmanager
+from typing import Generator, List
 
 import pytest
 import pytest_asyncio
@@ -10,6 +11,7 @@ from sqlalchemy.orm import sessionmaker
 import core.database.transactional as transactional
 from app.models import Base
 from core.config import config
+from core.database.session import session_context
 
 TEST_DATABASE_URL = os.getenv("TEST_POSTGRES_URL")
 
@@ -41,3 +43,84 @@ async def db_session() -> AsyncSession:
         pass
 
     await async_engine.dispose()
+
+
+class RecordingResult:
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.rowcount = len(rows)
+
+    def unique(self):
+        return self
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def scalar(self):
+        return len(self.rows)
+
+
+class RecordingSession:
+    """
+    Stand-in for a database session that records the calls made on it,
+    with the session context each call ran in.
+    """
+
+    def __init__(self, rows: list = ()):
+        self.rows = list(rows)
+        self.calls = []
+        self.statements = []
+        self.info = {}
+        self.begun = False
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self.calls]
+
+    def _record(self, name: str, value=None) -> None:
+        self.calls.append((name, value))
+
+    def in_transaction(self) -> bool:
+        return self.begun
+
+    def add(self, instance) -> None:
+        self._record("add")
+
+    async def execute(self, statement, params=None, execution_options=None):
+        self.statements.append(str(statement))
+        return RecordingResult(self.rows)
+
+    async def connection(self, execution_options=None):
+        self._record("connection", execution_options)
+
+    async def flush(self):
+        self._record("flush")
+
+    async def commit(self):
+        self._record("commit", session_context.get(None))
+
+    async def rollback(self):
+        self._record("rollback", session_context.get(None))
+
+    async def remove(self):
+        self._record("remove", session_context.get(None))
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self._record("savepoint")
+        try:
+            yield
+        except Exception:
+            self._record("rollback_savepoint")
+            raise
+        self._record("release_savepoint")
+
+
+@pytest.fixture
+def recording_session(monkeypatch) -> RecordingSession:
+    session = RecordingSession()
+    monkeypatch.setattr(transactional, "session", session)
+    return session
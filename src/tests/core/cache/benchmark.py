@@ -0,0 +1,91 @@
+"""
+Cache backend benchmark.
+
+Runs the same workload against a cache backend: a skewed (Zipf-like)
+stream of ``Cache.cached`` reads over a fixed key space, with a share of
+writes and periodic tag invalidations. Reports throughput, latency
+percentiles and the hit ratio. The in-memory backend is the reference
+the other backends are compared with.
+
+    python -m tests.core.cache.benchmark --backend memory
+    python -m tests.core.cache.benchmark --backend tiered --operations 50000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from core.cache import (
+    CacheTag,
+    CustomKeyMaker,
+    InMemoryBackend,
+    RedisBackend,
+    TieredBackend,
+)
+from core.cache.cache_manager import CacheManager
+
+BACKENDS = {
+    "memory": InMemoryBackend,
+    "redis": RedisBackend,
+    "tiered": TieredBackend,
+}
+
+
+async def run(backend_name: str, operations: int, keys: int, payload: int) -> dict:
+    backend = BACKENDS[backend_name]()
+    await backend.connect()
+
+    cache = CacheManager()
+    cache.init(backend=backend, key_maker=CustomKeyMaker())
+    calls = 0
+
+    @cache.cached(tag=CacheTag.GET_USER_LIST, ttl=60)
+    async def get_users(page: int):
+        nonlocal calls
+        calls += 1
+        results = [{"id": id_, "email": "a@b.c"} for id_ in range(payload)]
+        return {"page": page, "results": results}
+
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    pages = random.choices(range(keys), weights=weights, k=operations)
+    latencies = []
+
+    started = time.perf_counter()
+    for index, page in enumerate(pages, start=1):
+        call_started = time.perf_counter()
+        await get_users(page=page)
+        latencies.append(time.perf_counter() - call_started)
+        if index % (operations // 10 or 1) == 0:
+            await cache.remove_by_tag(CacheTag.GET_USER_LIST)
+    elapsed = time.perf_counter() - started
+
+    await cache.remove_by_tag(CacheTag.GET_USER_LIST)
+    await backend.close()
+
+    latencies.sort()
+    return dict(
+        backend=backend_name,
+        operations=operations,
+        ops_per_second=round(operations / elapsed),
+        p50_us=round(statistics.median(latencies) * 1e6, 1),
+        p99_us=round(latencies[int(len(latencies) * 0.99) - 1] * 1e6, 1),
+        hit_ratio=round(1 - calls / operations, 3),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=BACKENDS, default="memory")
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--payload", type=int, default=50)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.backend, args.operations, args.keys, args.payload))
+    for name, value in result.items():
+        print(f"{name:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
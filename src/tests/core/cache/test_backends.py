@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+
+import pytest
+import pytest_asyncio
+
+from core.cache import InMemoryBackend, RedisBackend
+
+# Behaviour every cache backend must share. Redis runs only when
+# TEST_REDIS_URL points at a server that may be flushed.
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+
+@pytest_asyncio.fixture(params=["memory", "redis"])
+async def backend(request):
+    if request.param == "memory":
+        yield InMemoryBackend()
+        return
+
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL is not set")
+    backend = RedisBackend(url=TEST_REDIS_URL)
+    await backend.redis.flushdb()
+    yield backend
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_set_and_get(backend):
+    await backend.set(response={"results": [1, 2]}, key="users::list", ttl=60)
+
+    assert await backend.get(key="users::list") == {"results": [1, 2]}
+    assert await backend.get(key="users::missing") is None
+
+
+@pytest.mark.asyncio
+async def test_values_expire(backend, monkeypatch):
+    await backend.set(response=[1], key="users::list", ttl=1)
+
+    if isinstance(backend, InMemoryBackend):
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 2)
+    else:
+        await asyncio.sleep(1.1)
+
+    assert await backend.get(key="users::list") is None
+
+
+@pytest.mark.asyncio
+async def test_delete_startswith_only_removes_the_prefix(backend):
+    await backend.set(response=[1], key="users::a", ttl=60)
+    await backend.set(response=[2], key="users_admin::a", ttl=60)
+
+    await backend.delete_startswith(value="users")
+
+    assert await backend.get(key="users::a") is None
+    assert await backend.get(key="users_admin::a") == [2]
+
+
+@pytest.mark.asyncio
+async def test_delete_tag(backend):
+    await backend.set(response=[1], key="users::a", ttl=60)
+    await backend.set(response=[2], key="items::a", ttl=60)
+
+    await backend.delete_tag(tag="users")
+
+    assert await backend.get(key="users::a") is None
+    assert await backend.get(key="items::a") == [2]
+
+
+@pytest.mark.asyncio
+async def test_many(backend):
+    await backend.set_many(responses={"users::1": [1], "users::2": [2]}, ttl=60)
+
+    assert await backend.get_many(keys=["users::1", "users::3", "users::2"]) == [
+        [1],
+        None,
+        [2],
+    ]
+
+    await backend.delete_many(keys=["users::1"])
+
+    assert await backend.get_many(keys=["users::1", "users::2"]) == [None, [2]]
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive(backend):
+    async with backend.lock("users::a", timeout=1) as acquired:
+        assert acquired
+        async with backend.lock("users::a", timeout=1, blocking=False) as other:
+            assert not other
+
+    async with backend.lock("users::a", timeout=1, blocking=False) as acquired:
+        assert acquired
+
+
+@pytest.mark.asyncio
+async def test_cached_values_are_not_shared(backend):
+    await backend.set(response={"results": [1]}, key="users::list", ttl=60)
+
+    (await backend.get(key="users::list"))["results"].append(2)
+
+    assert await backend.get(key="users::list") == {"results": [1]}
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_is_bounded():
+    backend = InMemoryBackend(maxsize=2)
+    for key in ("users::a", "users::b", "users::c"):
+        await backend.set(response=[key], key=key, ttl=60)
+
+    assert await backend.get_many(keys=["users::a", "users::b", "users::c"]) == [
+        None,
+        ["users::b"],
+        ["users::c"],
+    ]
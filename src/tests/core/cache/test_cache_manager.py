@@ -0,0 +1,180 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from app.models import User
+from core.cache import CacheTag, CustomKeyMaker
+from core.cache.base import BaseBackend
+from core.cache.cache_manager import CacheEntry, CacheManager
+
+
+class DictBackend(BaseBackend):
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key: str):
+        return self.values.get(key)
+
+    async def set(self, response, key: str, ttl: int = 60) -> None:
+        self.values[key] = response
+
+    async def delete_many(self, keys) -> None:
+        for key in keys:
+            self.values.pop(key, None)
+
+    async def delete_startswith(self, value: str) -> None:
+        for key in [key for key in self.values if key.startswith(f"{value}::")]:
+            del self.values[key]
+
+
+@pytest.fixture
+def cache():
+    manager = CacheManager()
+    manager.init(backend=DictBackend(), key_maker=CustomKeyMaker())
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_single_flight_collapses_concurrent_misses(cache):
+    calls = 0
+
+    @cache.cached(prefix="users", single_flight=True)
+    async def get_users():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["user"]
+
+    results = await asyncio.gather(*(get_users() for _ in range(10)))
+
+    assert calls == 1
+    assert results == [["user"]] * 10
+
+
+@pytest.mark.asyncio
+async def test_single_flight_loads_run_in_the_task_scope():
+    scoped = []
+
+    def task_scope(function):
+        async def scope():
+            scoped.append(function.__name__)
+            return await function()
+
+        return scope
+
+    cache = CacheManager()
+    cache.init(
+        backend=DictBackend(), key_maker=CustomKeyMaker(), task_scope=task_scope
+    )
+
+    @cache.cached(prefix="users", single_flight=True)
+    async def get_users():
+        return ["user"]
+
+    assert await get_users() == ["user"]
+    assert scoped == ["load"]
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing(cache):
+    calls = 0
+
+    @cache.cached(prefix="users", ttl=60, stale_ttl=60)
+    async def get_users():
+        nonlocal calls
+        calls += 1
+        return [calls]
+
+    assert await get_users() == [1]
+
+    [key] = cache.backend.values
+    entry = cache.backend.values[key]
+    cache.backend.values[key] = entry._replace(expires_at=time.time() - 1)
+
+    assert await get_users() == [1]
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert calls == 2
+    assert isinstance(cache.backend.values[key], CacheEntry)
+    assert cache.backend.values[key].value == [2]
+    assert await get_users() == [2]
+
+
+@pytest.mark.asyncio
+async def test_early_expiration_refreshes_slow_values(cache, monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.5)
+    calls = 0
+
+    @cache.cached(prefix="users", ttl=60, beta=1.0)
+    async def get_users():
+        nonlocal calls
+        calls += 1
+        return [calls]
+
+    await get_users()
+    [key] = cache.backend.values
+    cache.backend.values[key] = cache.backend.values[key]._replace(delta=3600)
+
+    assert await get_users() == [1]
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_remove_by_tag_falls_back_to_prefix_deletion(cache):
+    @cache.cached(tag=CacheTag.GET_USER_LIST)
+    async def get_users():
+        return ["user"]
+
+    @cache.cached(prefix="items")
+    async def get_items():
+        return ["item"]
+
+    await get_users()
+    await get_items()
+    await cache.remove_by_tag(CacheTag.GET_USER_LIST)
+
+    assert [key.split("::")[0] for key in cache.backend.values] == ["items"]
+
+
+@pytest.mark.asyncio
+async def test_cached_many_calls_function_only_for_misses(cache):
+    requested = []
+
+    class Item:
+        def __init__(self, id_):
+            self.id = id_
+
+    @cache.cached_many(prefix="items")
+    async def get_items(ids, active: bool = True):
+        requested.append(ids)
+        return [Item(id_) for id_ in ids if id_ != 4]
+
+    first = await get_items([1, 2])
+    second = await get_items(ids=[2, 3, 4])
+
+    assert requested == [[1, 2], [3, 4]]
+    assert sorted(first) == [1, 2]
+    assert sorted(second) == [2, 3]
+    assert second[2].id == 2
+    assert len(cache.backend.values) == 3
+
+
+@pytest.mark.asyncio
+async def test_unsupported_arguments_bypass_the_cache(cache):
+    calls = 0
+
+    @cache.cached(prefix="profiles")
+    async def get_profile(user):
+        nonlocal calls
+        calls += 1
+        return user.id
+
+    assert await get_profile(User(id=1)) == 1
+    assert await get_profile(User(id=2)) == 2
+    assert calls == 2
+    assert not cache.backend.values
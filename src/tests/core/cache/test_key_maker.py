@@ -0,0 +1,80 @@
+import pytest
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from core.cache import CustomKeyMaker
+from core.cache.base import UncacheableArgumentError
+from core.repository import BaseRepository
+
+
+class UserService:
+    async def get_all(self, skip: int = 0, limit: int = 100, session=None):
+        ...
+
+
+@pytest.fixture
+def key_maker():
+    return CustomKeyMaker()
+
+
+@pytest.mark.asyncio
+async def test_different_arguments_make_different_keys(key_maker):
+    service = UserService()
+    first = await key_maker.make(service.get_all, "users", args=(), kwargs={"skip": 0})
+    second = await key_maker.make(service.get_all, "users", args=(), kwargs={"skip": 500})
+
+    assert first != second
+    assert first.startswith("users::")
+
+
+@pytest.mark.asyncio
+async def test_defaults_and_positional_arguments_are_normalized(key_maker):
+    first = await key_maker.make(UserService.get_all, "users", args=(UserService(),))
+    second = await key_maker.make(
+        UserService.get_all, "users", args=(UserService(), 0), kwargs={"limit": 100}
+    )
+
+    assert first == second
+
+
+@pytest.mark.asyncio
+async def test_injected_dependencies_are_skipped(key_maker):
+    first = await key_maker.make(
+        UserService.get_all,
+        "users",
+        args=(UserService(),),
+        kwargs={"session": AsyncSession()},
+    )
+    second = await key_maker.make(
+        UserService.get_all,
+        "users",
+        args=(UserService(),),
+        kwargs={"session": BaseRepository(User, AsyncSession())},
+    )
+
+    assert first == second
+
+
+@pytest.mark.asyncio
+async def test_depends_parameters_are_skipped(key_maker):
+    async def get_profile(user_id: int, current_user=Depends(lambda: None)):
+        ...
+
+    first = await key_maker.make(
+        get_profile, "users", args=(1,), kwargs={"current_user": User(id=1)}
+    )
+    second = await key_maker.make(
+        get_profile, "users", args=(1,), kwargs={"current_user": User(id=2)}
+    )
+
+    assert first == second
+
+
+@pytest.mark.asyncio
+async def test_unsupported_arguments_are_rejected(key_maker):
+    async def get_profile(user):
+        ...
+
+    with pytest.raises(UncacheableArgumentError):
+        await key_maker.make(get_profile, "users", args=(User(id=1),))
@@ -0,0 +1,53 @@
+import time
+
+import ujson
+
+from core.cache import LRUCache, TieredBackend
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_size_limit_evicts_and_skips_oversized_entries():
+    cache = LRUCache(max_bytes=100)
+    cache.set("a", 1, ttl=60, size=60)
+    cache.set("b", 2, ttl=60, size=60)
+    cache.set("c", 3, ttl=60, size=500)
+
+    assert "a" not in cache
+    assert "b" in cache
+    assert "c" not in cache
+    assert cache.bytes == 60
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = LRUCache()
+    cache.set("a", 1, ttl=5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 10)
+
+    assert cache.get("a") is None
+    assert cache.info()["misses"] == 1
+    assert len(cache) == 0
+
+
+def test_invalidations_from_other_workers_drop_local_entries():
+    backend = TieredBackend()
+    backend.local.set("users::a", 1, ttl=60)
+    backend.local.set("items::a", 2, ttl=60)
+
+    backend._on_invalidation(ujson.dumps({"origin": backend.origin, "prefix": "items"}))
+    assert "items::a" in backend.local
+
+    backend._on_invalidation(ujson.dumps({"origin": "other", "prefix": "items"}))
+    assert "items::a" not in backend.local
+    assert "users::a" in backend.local
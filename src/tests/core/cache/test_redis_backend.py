@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import core.cache.redis_backend as redis_backend
+from core.cache import Cache, RedisBackend
+from core.config import config
+from core.server import connect_cache
+
+
+def test_hiredis_parser_requires_hiredis(monkeypatch):
+    monkeypatch.setattr(config, "REDIS_PARSER", "hiredis")
+    monkeypatch.setattr(redis_backend, "HIREDIS_AVAILABLE", False)
+
+    with pytest.raises(ImportError, match="hiredis"):
+        RedisBackend().redis
+
+
+@pytest.mark.asyncio
+async def test_pool_is_built_from_config_and_released_on_close(monkeypatch):
+    monkeypatch.setattr(config, "REDIS_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(config, "REDIS_HEALTH_CHECK_INTERVAL", 15)
+    backend = RedisBackend()
+
+    pool = backend.redis.connection_pool
+
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["health_check_interval"] == 15
+    assert backend.pool_stats()["utilization"] == 0.0
+    assert backend.stats() == {"pool": backend.pool_stats()}
+
+    await backend.close()
+
+    assert backend.pool is None
+
+
+@pytest.mark.asyncio
+async def test_unavailable_backend_does_not_fail_startup(monkeypatch):
+    backend = RedisBackend(url="redis://127.0.0.1:1/0")
+    monkeypatch.setattr(Cache, "backend", backend)
+
+    await connect_cache()
+
+    monkeypatch.setattr(config, "CACHE_STRICT_CONNECT", True)
+    with pytest.raises(RedisConnectionError):
+        await connect_cache()
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_tag_writes_schedule_pruning(monkeypatch):
+    monkeypatch.setattr(config, "CACHE_TAG_PRUNE_INTERVAL", 2)
+    backend = RedisBackend()
+    pruned = []
+
+    async def prune_tag(tag):
+        pruned.append(tag)
+
+    monkeypatch.setattr(backend, "prune_tag", prune_tag)
+
+    for _ in range(3):
+        backend._count_tag_writes("users")
+    await asyncio.gather(*backend._pruning.values())
+    await asyncio.sleep(0)
+
+    assert pruned == ["users"]
+    assert not backend._pruning
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_REDIS_URL"), reason="TEST_REDIS_URL is not set"
+)
+async def test_prune_tag_removes_expired_keys():
+    backend = RedisBackend(url=os.getenv("TEST_REDIS_URL"))
+    await backend.redis.flushdb()
+    await backend.set(response=[1], key="users::a", ttl=60)
+    await backend.set(response=[2], key="users::b", ttl=60)
+    await backend.redis.delete("users::a")
+
+    assert await backend.prune_tag("users") == 1
+    assert await backend.redis.smembers("tag:users") == {b"users::b"}
+    await backend.close()
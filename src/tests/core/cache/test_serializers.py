@@ -0,0 +1,83 @@
+import datetime
+import pickle
+
+import pytest
+import ujson
+from pydantic import BaseModel
+
+from app.models import User
+from core.cache import CacheEntry, Serializer
+from core.cache.serializers import JSON, PICKLE, ZLIB, msgpack
+
+
+class UserResponse(BaseModel):
+    id: int
+    email: str
+
+
+def test_auto_codec_keeps_types():
+    serializer = Serializer()
+    plain = {"results": [1, 2], "count": 2}
+    dated = {"created_at": datetime.datetime(2023, 1, 1)}
+    model = UserResponse(id=1, email="a@b.c")
+
+    assert serializer.dumps(plain)[0] == JSON
+    assert serializer.loads(serializer.dumps(plain)) == plain
+    assert serializer.dumps(dated)[0] == PICKLE
+    assert serializer.loads(serializer.dumps(dated)) == dated
+    assert serializer.loads(serializer.dumps(model)) == model
+
+
+def test_json_codec_encodes_models_and_orm_instances():
+    serializer = Serializer(codec="json")
+    user = User(id=1, email="a@b.c", phone="+100")
+
+    payload = serializer.dumps([UserResponse(id=1, email="a@b.c"), user])
+    users = serializer.loads(payload)
+
+    assert payload[0] == JSON
+    assert users[0] == {"id": 1, "email": "a@b.c"}
+    assert users[1]["phone"] == "+100"
+
+
+@pytest.mark.parametrize(
+    "codec",
+    [
+        "auto",
+        "pickle",
+        "json",
+        pytest.param(
+            "msgpack",
+            marks=pytest.mark.skipif(msgpack is None, reason="msgpack missing"),
+        ),
+    ],
+)
+def test_cache_entries_keep_their_type(codec):
+    serializer = Serializer(codec=codec)
+    entry = CacheEntry({"results": [1, 2]}, 1700000000.5, 0.25)
+
+    loaded = serializer.loads(serializer.dumps(entry))
+
+    assert isinstance(loaded, CacheEntry)
+    assert loaded == entry
+
+
+def test_large_payloads_are_compressed():
+    serializer = Serializer(compression="zlib", compress_min_size=100)
+    value = {"results": ["user"] * 100}
+
+    assert serializer.dumps({"a": 1})[0] == JSON
+    assert serializer.dumps(value)[0] == JSON | ZLIB
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_legacy_payloads_are_decoded():
+    serializer = Serializer()
+
+    assert serializer.loads(ujson.dumps({"a": 1}).encode()) == {"a": 1}
+    assert serializer.loads(pickle.dumps([1, 2])) == [1, 2]
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        Serializer(codec="yaml")
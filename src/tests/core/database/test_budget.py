@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from core.config import config
+from core.database import QueryBudget
+from core.database.budget import (
+    apply_timeouts,
+    budget_metrics,
+    budget_usage,
+    end_budget,
+    instrument,
+    server_settings,
+    start_budget,
+)
+from core.exceptions import QueryBudgetExceededException
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument(SimpleNamespace(sync_engine=engine))
+    return engine
+
+
+@pytest.fixture
+def budget():
+    token = start_budget()
+    yield budget_usage.get()
+    end_budget(token)
+
+
+def test_queries_over_the_limit_are_rejected(engine, budget):
+    budget.budget.max_queries = 2
+    exceeded = budget_metrics.queries_exceeded
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 1"))
+        with pytest.raises(QueryBudgetExceededException):
+            connection.execute(text("SELECT 1"))
+
+    assert budget.queries == 3
+    assert budget_metrics.queries_exceeded == exceeded + 1
+
+
+def test_queries_outside_a_request_are_not_limited(engine, monkeypatch):
+    monkeypatch.setattr(config, "DB_MAX_QUERIES_PER_REQUEST", 1)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 1"))
+
+
+@pytest.mark.asyncio
+async def test_route_budget_overrides_global_limits(budget):
+    await QueryBudget(statement_timeout=500, max_rows=10)()
+
+    assert budget.budget.statement_timeout == 500
+    assert budget.budget.max_rows == 10
+    assert budget.budget.max_queries == config.DB_MAX_QUERIES_PER_REQUEST
+
+
+class RecordingConnection:
+    closed = False
+
+    def __init__(self):
+        self.statements = []
+
+    def in_transaction(self) -> bool:
+        return True
+
+    def exec_driver_sql(self, statement, execution_options=None):
+        self.statements.append(statement)
+
+
+@pytest.mark.asyncio
+async def test_route_timeouts_apply_to_a_running_transaction(budget):
+    connection = RecordingConnection()
+    apply_timeouts(None, None, connection)
+
+    await QueryBudget(statement_timeout=500)()
+
+    assert connection.statements == ["SET LOCAL statement_timeout = 500"]
+
+
+def test_global_timeouts_are_server_settings(monkeypatch):
+    monkeypatch.setattr(config, "DB_STATEMENT_TIMEOUT", 1000)
+    monkeypatch.setattr(config, "DB_LOCK_TIMEOUT", 0)
+
+    assert server_settings() == {"statement_timeout": "1000"}
@@ -0,0 +1,110 @@
+import importlib
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import core.database.transactional as transactional
+from app.models import User
+from core.database import Transactional
+from core.database.replicas import ReplicaSet
+
+session_module = importlib.import_module("core.database.session")
+
+
+def make_engine(host: str):
+    return create_async_engine(f"postgresql+asyncpg://user:password@{host}/db")
+
+
+@pytest.fixture
+def replica_set(monkeypatch):
+    replica_set = ReplicaSet(
+        engines=[make_engine("replica-1"), make_engine("replica-2")]
+    )
+    monkeypatch.setattr(session_module, "replicas", replica_set)
+    return replica_set
+
+
+def test_round_robin_selection(replica_set):
+    chosen = [replica_set.choose() for _ in range(4)]
+
+    assert chosen == replica_set.engines * 2
+
+
+def test_no_healthy_replica_falls_back_to_writer(replica_set):
+    replica_set.healthy = []
+    session = session_module.RoutingSession()
+
+    assert session.get_bind(clause=select(User)) is session_module.engines[
+        "writer"
+    ].sync_engine
+
+
+def test_reads_stick_to_one_replica(replica_set):
+    session = session_module.RoutingSession()
+
+    first = session.get_bind(clause=select(User))
+    second = session.get_bind(clause=select(User))
+
+    assert first is second is replica_set.engines[0].sync_engine
+
+
+def test_reads_after_a_write_go_to_the_writer(replica_set):
+    session = session_module.RoutingSession()
+    writer = session_module.engines["writer"].sync_engine
+
+    assert session.get_bind(clause=select(User)) is not writer
+    assert session.get_bind(clause=update(User).values(email="a")) is writer
+    assert session.get_bind(clause=select(User)) is writer
+
+
+@pytest.mark.parametrize(
+    "clause", [select(User).with_for_update(), text("SELECT 1")]
+)
+def test_locking_reads_and_raw_sql_go_to_the_writer(replica_set, clause):
+    session = session_module.RoutingSession()
+
+    assert session.get_bind(clause=clause) is session_module.engines[
+        "writer"
+    ].sync_engine
+
+
+def test_raw_reads_do_not_stick_to_the_writer(replica_set):
+    session = session_module.RoutingSession()
+    writer = session_module.engines["writer"].sync_engine
+
+    assert session.get_bind(clause=text("SELECT 1")) is writer
+    assert session.get_bind(clause=select(User)) is not writer
+    assert session.get_bind(clause=text("DELETE FROM users")) is writer
+    assert session.get_bind(clause=select(User)) is writer
+
+
+def test_raw_sql_marked_readonly_goes_to_the_replica(replica_set):
+    session = session_module.RoutingSession()
+    clause = text("SELECT reltuples FROM pg_class").execution_options(
+        readonly=True
+    )
+
+    assert session.get_bind(clause=clause) is replica_set.engines[0].sync_engine
+    assert "writer" not in session.info
+
+
+@pytest.mark.asyncio
+async def test_reads_inside_a_transaction_go_to_the_writer(replica_set, monkeypatch):
+    session = AsyncSession(sync_session_class=session_module.RoutingSession)
+    monkeypatch.setattr(transactional, "session", session)
+    writer = session_module.engines["writer"].sync_engine
+
+    @Transactional()
+    async def read_then_write():
+        return (
+            session.sync_session.get_bind(clause=select(User)),
+            session.sync_session.get_bind(clause=update(User)),
+        )
+
+    assert await read_then_write() == (writer, writer)
+
+
+def test_unknown_selection_is_rejected():
+    with pytest.raises(ValueError):
+        ReplicaSet(engines=[], selection="random")
@@ -0,0 +1,164 @@
+import pytest
+from sqlalchemy.exc import DBAPIError, InvalidRequestError
+
+import core.database.transactional as transactional
+from core.database import Propagation, Transactional
+from core.database.session import session_context
+
+
+class SerializationFailure(Exception):
+    sqlstate = "40001"
+
+
+def serialization_failure() -> DBAPIError:
+    return DBAPIError("UPDATE", {}, SerializationFailure())
+
+
+@pytest.fixture
+def session(recording_session, monkeypatch):
+    monkeypatch.setattr(
+        transactional.Transactional, "_backoff", staticmethod(lambda attempt: 0)
+    )
+    return recording_session
+
+
+@pytest.mark.asyncio
+async def test_only_the_outermost_boundary_commits(session):
+    @Transactional()
+    async def inner():
+        return "inner"
+
+    @Transactional()
+    async def outer():
+        return await inner()
+
+    assert await outer() == "inner"
+    assert session.names == ["commit"]
+
+
+@pytest.mark.asyncio
+async def test_nested_failure_rolls_back_to_its_savepoint(session):
+    @Transactional(propagation=Propagation.NESTED)
+    async def inner():
+        raise ValueError
+
+    @Transactional()
+    async def outer():
+        with pytest.raises(ValueError):
+            await inner()
+        return "outer"
+
+    assert await outer() == "outer"
+    assert session.names == ["savepoint", "rollback_savepoint", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_required_new_commits_in_its_own_session(session):
+    @Transactional(propagation=Propagation.REQUIRED_NEW)
+    async def inner():
+        return session_context.get()
+
+    @Transactional()
+    async def outer():
+        return await inner()
+
+    token = session_context.set("request")
+    try:
+        inner_context = await outer()
+    finally:
+        session_context.reset(token)
+
+    assert inner_context != "request"
+    assert session.calls == [
+        ("commit", inner_context),
+        ("remove", inner_context),
+        ("commit", "request"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_isolation_level_runs_in_a_new_session_on_the_writer(session):
+    @Transactional(isolation_level="SERIALIZABLE")
+    async def function():
+        return session_context.get()
+
+    token = session_context.set("request")
+    try:
+        context = await function()
+    finally:
+        session_context.reset(token)
+
+    assert context != "request"
+    assert session.info["writer"] is True
+    assert session.calls == [
+        ("connection", {"isolation_level": "SERIALIZABLE"}),
+        ("commit", context),
+        ("remove", context),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_isolation_level_is_rejected_inside_a_transaction(session):
+    @Transactional(isolation_level="SERIALIZABLE")
+    async def inner():
+        pass
+
+    @Transactional()
+    async def outer():
+        await inner()
+
+    with pytest.raises(InvalidRequestError):
+        await outer()
+
+
+@pytest.mark.asyncio
+async def test_isolation_level_is_rejected_on_a_begun_session(session):
+    session.begun = True
+
+    @Transactional(isolation_level="SERIALIZABLE")
+    async def function():
+        pass
+
+    with pytest.raises(InvalidRequestError):
+        await function()
+
+    assert "commit" not in session.names
+
+
+@pytest.mark.asyncio
+async def test_serialization_failures_are_retried(session):
+    attempts = []
+
+    @Transactional(retries=2)
+    async def function():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise serialization_failure()
+        return len(attempts)
+
+    assert await function() == 3
+    assert session.names == ["rollback", "rollback", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded(session):
+    @Transactional(retries=1)
+    async def function():
+        raise serialization_failure()
+
+    with pytest.raises(DBAPIError):
+        await function()
+
+    assert session.names == ["rollback", "rollback"]
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried(session):
+    @Transactional(retries=3)
+    async def function():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        await function()
+
+    assert session.names == ["rollback"]
@@ -0,0 +1,90 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from core.config import config
+from core.database import get_session, session
+from core.database.session import session_context
+from core.fastapi.middlewares import SQLAlchemyMiddleware, skip_db_session
+
+
+def has_session_context() -> bool:
+    return session_context.get(None) is not None
+
+
+@pytest.fixture
+def app():
+    app_ = FastAPI()
+    app_.add_middleware(SQLAlchemyMiddleware, exclude_paths=("/excluded",))
+
+    @app_.get("/default")
+    async def default(db_session=Depends(get_session)):
+        return {"context": has_session_context(), "session": db_session.registry.has()}
+
+    @app_.get("/skipped/{item_id}")
+    @skip_db_session
+    async def skipped(item_id: int):
+        return {"context": has_session_context()}
+
+    @app_.get("/excluded")
+    async def excluded():
+        return {"context": has_session_context()}
+
+    @app_.post("/users")
+    async def create_user(fail: bool = False):
+        session.add(User(email="user@example.com"))
+        if fail:
+            raise HTTPException(status_code=400)
+        return {}
+
+    return app_
+
+
+@pytest.mark.asyncio
+async def test_session_is_not_created_until_used(app):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/default")
+
+    assert response.json() == {"context": True, "session": False}
+    assert not session.registry.registry
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/skipped/1", "/excluded"])
+async def test_opted_out_requests_get_no_session_context(app, path):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(path)
+
+    assert response.json() == {"context": False}
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    commits = []
+
+    async def commit(self):
+        commits.append(self)
+
+    monkeypatch.setattr(AsyncSession, "commit", commit)
+    monkeypatch.setattr(config, "ORM_AUTOCOMMIT", False)
+    return commits
+
+
+@pytest.mark.asyncio
+async def test_pending_writes_are_committed_without_autocommit(app, commits):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/users")
+
+    assert response.status_code == 200
+    assert len(commits) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_not_committed(app, commits):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/users", params={"fail": True})
+
+    assert response.status_code == 400
+    assert not commits
@@ -0,0 +1,28 @@
+import pytest
+
+from app.models import User
+
+
+def test_rows_missing_a_column_get_its_default():
+    rows = User.objects._column_rows(
+        [
+            dict(email="a@example.com", password="a", phone="1"),
+            dict(email="b@example.com", password="b", is_admin=True),
+        ]
+    )
+
+    assert [set(row) for row in rows] == [
+        {"email", "password", "phone", "is_admin"}
+    ] * 2
+    assert rows[0]["is_admin"] is False
+    assert rows[1]["phone"] is None
+
+
+def test_rows_missing_a_column_with_an_sql_default_are_rejected():
+    with pytest.raises(ValueError, match="created_at"):
+        User.objects._column_rows(
+            [
+                dict(email="a@example.com", password="a", created_at=None),
+                dict(email="b@example.com", password="b"),
+            ]
+        )
@@ -0,0 +1,62 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import User
+from core.orm.pagination import InvalidCursorException
+from core.repository import BaseRepository, CountStrategy
+
+
+class TestKeysetPagination:
+    def test_primary_key_is_appended_to_ordering(self):
+        query = User.objects.filter(order_by="-created_at", keyset=True)
+
+        assert query._keyset_fields == ("-created_at", "-id")
+        assert "q__offset" not in query.params
+
+    def test_cursor_round_trip(self):
+        first_page = User.objects.filter(
+            order_by="-created_at", keyset=True, limit=1
+        )
+        last_row = SimpleNamespace(
+            created_at=datetime.datetime(2023, 11, 7, 22, 55), id=42
+        )
+        cursor = first_page.next_cursor([last_row])
+
+        second_page = User.objects.filter(
+            order_by="-created_at", cursor=cursor, limit=1
+        )
+
+        assert second_page.params["q__cursor_0"] == last_row.created_at
+        assert second_page.params["q__cursor_1"] == 42
+        assert "(users.created_at, users.id) <" in str(second_page.query)
+
+    def test_no_cursor_for_last_page(self):
+        query = User.objects.filter(order_by="id", keyset=True, limit=10)
+
+        assert query.next_cursor([SimpleNamespace(id=1)]) is None
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        query = User.objects.filter(order_by="email", keyset=True, limit=1)
+        cursor = query.next_cursor([SimpleNamespace(email="a@b.c", id=1)])
+
+        with pytest.raises(InvalidCursorException):
+            User.objects.filter(order_by="-created_at", cursor=cursor)
+
+    @pytest.mark.asyncio
+    async def test_window_count_ignores_the_cursor(self, recording_session):
+        first_page = User.objects.filter(order_by="id", keyset=True, limit=1)
+        cursor = first_page.next_cursor([SimpleNamespace(id=1)])
+        repository = BaseRepository(model=User, db_session=recording_session)
+
+        await repository.filter_and_count(
+            order_by="id",
+            limit=1,
+            cursor=cursor,
+            count_strategy=CountStrategy.WINDOW,
+        )
+
+        count_statement = recording_session.statements[-1]
+        assert "OVER" not in count_statement
+        assert "users.id >" not in count_statement
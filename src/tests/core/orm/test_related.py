@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import BigInteger, Column, ForeignKey, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import declarative_base, relationship
+
+from core.orm.models import AbstractModel
+
+Base = declarative_base()
+
+
+class Company(Base, AbstractModel):
+    __tablename__ = "companies"
+
+    id = Column(BigInteger, primary_key=True)
+    name = Column(String)
+
+
+class Author(Base, AbstractModel):
+    __tablename__ = "authors"
+
+    id = Column(BigInteger, primary_key=True)
+    company_id = Column(BigInteger, ForeignKey("companies.id"))
+    company = relationship(Company)
+    books = relationship("Book", back_populates="author")
+
+
+class Book(Base, AbstractModel):
+    __tablename__ = "books"
+
+    id = Column(BigInteger, primary_key=True)
+    author_id = Column(BigInteger, ForeignKey("authors.id"))
+    author = relationship(Author, back_populates="books")
+
+
+def compile_query(query) -> str:
+    return str(query.query.compile(dialect=postgresql.dialect()))
+
+
+class TestRelatedLoading:
+    def test_select_related_joins_relationship(self):
+        query = Book.objects.filter(id__gt=1).select_related("author__company")
+
+        sql = compile_query(query)
+        assert "LEFT OUTER JOIN authors" in sql
+        assert "LEFT OUTER JOIN companies" in sql
+        assert query._joined_eager
+
+    def test_select_related_before_filter(self):
+        query = Book.objects.select_related("author").filter(id__gt=1)
+
+        assert "LEFT OUTER JOIN authors" in compile_query(query)
+
+    def test_prefetch_related_does_not_join(self):
+        query = Author.objects.filter().prefetch_related(Book)
+
+        assert "JOIN" not in compile_query(query)
+        assert len(query._loader_options) == 1
+        assert not query._joined_eager
+
+    def test_select_related_collections_are_tracked(self):
+        assert Author.objects.filter().select_related("books")._joined_collections
+        assert not Book.objects.filter().select_related(
+            "author"
+        )._joined_collections
+
+    @pytest.mark.asyncio
+    async def test_count_of_joined_collections_is_exact(self, recording_session):
+        query = Author.objects.filter().select_related("books")
+
+        assert await query.execute_with_count(recording_session) == ([], 0)
+        assert not any(
+            "OVER" in statement for statement in recording_session.statements
+        )
+
+    @pytest.mark.asyncio
+    async def test_count_of_distinct_queries_is_exact(self, recording_session):
+        query = Book.objects.filter(
+            order_by="author_id", distinct_fields=["author_id"]
+        )
+
+        await query.execute_with_count(recording_session)
+
+        assert not any(
+            "OVER" in statement for statement in recording_session.statements
+        )
+
+    @pytest.mark.asyncio
+    async def test_stream_rejects_joined_collections(self, recording_session):
+        query = Author.objects.filter().select_related("books")
+
+        with pytest.raises(ValueError, match="prefetch_related"):
+            async for _ in query.stream(recording_session):
+                pass
+
+    def test_unknown_relationship(self):
+        with pytest.raises(ValueError):
+            Book.objects.select_related("publisher")
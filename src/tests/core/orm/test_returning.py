@@ -0,0 +1,51 @@
+import pytest
+
+from app.models import User
+
+
+@pytest.mark.asyncio
+async def test_update_returning_loads_instances_in_one_statement(recording_session):
+    users = [User(id=1), User(id=2)]
+    recording_session.rows = users
+
+    updated = await User.objects.update(
+        recording_session, data={"phone": "1"}, returning=True, id__in=[1, 2]
+    )
+
+    assert updated == users
+    assert len(recording_session.statements) == 1
+    assert "RETURNING" in recording_session.statements[0]
+
+
+@pytest.mark.asyncio
+async def test_update_with_limit_one_returns_the_instance(recording_session):
+    user = User(id=1)
+    recording_session.rows = [user]
+
+    updated = await User.objects.update(
+        recording_session, data={"phone": "1"}, limit=1, id=1
+    )
+
+    assert updated is user
+    assert len(recording_session.statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_update_returns_the_rowcount_by_default(recording_session):
+    recording_session.rows = [User(id=1), User(id=2)]
+
+    updated = await User.objects.update(recording_session, data={"phone": "1"})
+
+    assert updated == 2
+    assert "RETURNING" not in recording_session.statements[0]
+
+
+@pytest.mark.asyncio
+async def test_delete_returning_loads_the_deleted_instances(recording_session):
+    users = [User(id=1)]
+    recording_session.rows = users
+
+    deleted = await User.objects.delete(recording_session, returning=True, id=1)
+
+    assert deleted == users
+    assert "RETURNING" in recording_session.statements[0]
@@ -0,0 +1,35 @@
+import pytest
+
+from app.models import User
+
+
+class TestExclude:
+    def test_exclude_is_compiled_to_sql(self):
+        query = User.objects.filter(order_by="id").exclude(is_admin=True)
+
+        assert "(users.is_admin = " in str(query.query)
+        assert "IS NOT true" in str(query.query)
+        assert query.params["q_not_is_admin"] is True
+
+    def test_exclude_before_filter(self):
+        query = User.objects.exclude(email__icontains="spam").filter(
+            phone__startswith="+7"
+        )
+
+        assert query.params["q_not_email__icontains"] == "%spam%"
+        assert query.params["q_phone__startswith"] == "+7"
+
+    def test_exclude_and_filter_use_separate_params(self):
+        query = User.objects.filter(is_admin=False).exclude(is_admin=True)
+
+        assert query.params["q_is_admin"] is False
+        assert query.params["q_not_is_admin"] is True
+
+
+class TestGetOrCreate:
+    @pytest.mark.asyncio
+    async def test_atomic_rejects_non_equality_filters(self, recording_session):
+        with pytest.raises(ValueError, match="Atomic get_or_create"):
+            await User.objects.get_or_create(
+                recording_session, {}, atomic=True, email__icontains="a"
+            )
@@ -0,0 +1,40 @@
+from app.models import User
+from core.orm.base import BaseQuery
+
+
+class TestStatementCache:
+    def setup_method(self):
+        BaseQuery.statement_cache.clear()
+
+    def test_same_shape_reuses_statement(self):
+        first = User.objects.filter(email__icontains="foo", skip=10)
+        second = User.objects.filter(email__icontains="bar", skip=20)
+
+        assert first.query is second.query
+        assert second.params["q_email__icontains"] == "%bar%"
+        assert second.params["q__offset"] == 20
+        assert BaseQuery.statement_cache.info()["hits"] == 1
+        assert BaseQuery.statement_cache.info()["misses"] == 1
+
+    def test_different_shape_builds_new_statement(self):
+        first = User.objects.filter(email="foo")
+        second = User.objects.filter(email=None)
+        third = User.objects.filter(email="foo", order_by="-id")
+
+        assert first.query is not second.query
+        assert first.query is not third.query
+        assert "IS NULL" in str(second.query)
+        assert "q_email" not in second.params
+
+    def test_in_and_range_lookups_are_bound(self):
+        query = User.objects.filter(id__in=[1, 2, 3], id__range=(1, 10))
+
+        assert query.params["q_id__in"] == [1, 2, 3]
+        assert query.params["q_id__range_0"] == 1
+        assert query.params["q_id__range_1"] == 10
+
+    def test_where_clauses_are_not_cached(self):
+        User.objects.filter(where=[User.id > 1])
+
+        assert BaseQuery.statement_cache.info()["uncacheable"] == 1
+        assert BaseQuery.statement_cache.info()["size"] == 0
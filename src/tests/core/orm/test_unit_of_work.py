@@ -0,0 +1,70 @@
+import pytest
+from faker import Faker
+
+from app.models import User
+from core.config import config
+from core.database import Transactional
+from core.orm.transaction import PENDING_COMMIT
+
+fake = Faker()
+
+
+def user_data() -> dict:
+    return dict(email=fake.email(), password=fake.password())
+
+
+@pytest.mark.asyncio
+async def test_writes_commit_outside_a_transaction(recording_session):
+    await User.objects.create(recording_session, **user_data())
+
+    assert recording_session.names == ["add", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_writes_only_flush_inside_a_transaction(recording_session):
+    @Transactional()
+    async def create_users():
+        await User.objects.create(recording_session, **user_data())
+        await User.objects.create(recording_session, **user_data())
+
+    await create_users()
+
+    assert recording_session.names == ["add", "flush", "add", "flush", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_writes_only_flush_without_autocommit(recording_session, monkeypatch):
+    monkeypatch.setattr(config, "ORM_AUTOCOMMIT", False)
+
+    await User.objects.create(recording_session, **user_data())
+
+    assert recording_session.names == ["add", "flush"]
+    assert recording_session.info[PENDING_COMMIT] is True
+
+
+@pytest.mark.asyncio
+async def test_commit_argument_overrides_the_default(recording_session):
+    @Transactional()
+    async def create_user():
+        await User.objects.create(recording_session, commit=True, **user_data())
+
+    await create_user()
+
+    assert recording_session.names == ["add", "commit", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_transaction_commits_its_writes_together(db_session):
+    @Transactional()
+    async def create_users(fail: bool):
+        await User.objects.create(db_session, **user_data())
+        await User.objects.create(db_session, **user_data())
+        if fail:
+            raise ValueError
+
+    with pytest.raises(ValueError):
+        await create_users(fail=True)
+    assert await User.objects.filter().count(db_session) == 0
+
+    await create_users(fail=False)
+    assert await User.objects.filter().count(db_session) == 2